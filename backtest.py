@@ -0,0 +1,192 @@
+from constants import MODEL_FEATURES, BACKTEST_MAX_WORKERS, BACKTEST_MIN_TRAIN_GWS
+from concurrent.futures import ProcessPoolExecutor
+from feature_store import FeatureStore
+from features import FEATURE_REGISTRY
+from optimizer import SquadOptimizer, Scenario
+from dataclasses import dataclass
+from utils import logger
+import multiprocessing
+import logging
+import pandas
+import numpy
+import time
+import os
+
+# Model features a fold may use: those summed from the player's own history over the target's gw+1..last_gw
+# rounds (points_per_90, adjusted_points_per_90, minutes_played_horizon) contain the realised target.
+FOLD_FEATURES = [feature for feature in MODEL_FEATURES if not FEATURE_REGISTRY.depends_on(feature, ('_player_window',))]
+
+
+def make_default_model():
+    """
+    Returns an unfitted copy of the notebook's model: RobustScaler followed by CatBoost.
+    """
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import RobustScaler
+    from catboost import CatBoostRegressor
+    return make_pipeline(RobustScaler(), CatBoostRegressor(iterations=1000, learning_rate=0.02, depth=6, verbose=0))
+
+
+def get_model_inputs(X, features=FOLD_FEATURES):
+    X = X.loc[:, ~X.columns.duplicated()]
+    return X[list(features)].astype(float).fillna(0)
+
+
+@dataclass
+class Fold():
+    """
+    One walk-forward fold: fit on the `train` partitions, predict the `test` one. Partitions are (gw, horizon)
+    pairs of a `FeatureStore`, which each worker opens itself so only this small description crosses processes.
+    """
+    model_name: str
+    model_factory: object
+    horizon: object
+    test: tuple
+    train: list
+    features: list
+    season: int
+    store_root: str
+    teams: dict = None
+
+
+def run_fold(fold):
+    """
+    Fits a fresh model on a fold's training partitions and scores it on the test partition.
+
+    Returns:
+        dict: The fold's identifiers, sizes, error metrics and, when `fold.teams` is given, the realised points of
+        the squad selected from the predictions.
+    """
+    start = time.perf_counter()
+    store = FeatureStore(fold.features, fold.season, root=fold.store_root)
+    train = [store.read(gw, horizon) for gw, horizon in fold.train]
+    X_train = get_model_inputs(pandas.concat([X for X, _ in train]))
+    Y_train = pandas.concat([Y for _, Y in train]).to_numpy(dtype=float)
+    X_test, Y_test = store.read(*fold.test)
+    Y_test = Y_test.to_numpy(dtype=float)
+
+    model = fold.model_factory()
+    model.fit(X_train, Y_train)
+    inputs = get_model_inputs(X_test)
+    predictions = numpy.asarray(model.predict(inputs), dtype=float)
+    if 'num_fixtures' in inputs.columns:
+        predictions[inputs['num_fixtures'].to_numpy() == 0] = 0
+
+    errors = predictions - Y_test
+    total = ((Y_test - Y_test.mean()) ** 2).sum()
+    result = {
+        'model': fold.model_name, 'horizon': fold.horizon, 'gw': fold.test[0], 'gws_ahead': fold.test[1],
+        'train_gws': len({gw for gw, _ in fold.train}), 'train_rows': len(Y_train), 'test_rows': len(Y_test),
+        'mae': numpy.abs(errors).mean(), 'rmse': numpy.sqrt((errors ** 2).mean()),
+        'r2': 1 - (errors ** 2).sum() / total if total else numpy.nan,
+    }
+    if fold.teams is not None:
+        result.update(score_selection(X_test, predictions, Y_test, fold.teams))
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def score_selection(X, predictions, realised, teams):
+    """
+    Selects the optimal squad on the predictions and returns its predicted and realised points (XI plus the
+    captain again), next to the realised points of the best squad in hindsight.
+    """
+    ids = X.index.to_numpy()
+    X = X.loc[:, ~X.columns.duplicated()]
+    clubs = numpy.array([teams.get(player_id, -player_id) for player_id in ids.tolist()])
+    costs, positions = X['now_cost'].to_numpy(dtype=float), X['element_type'].to_numpy(dtype=int)
+    rows = {player_id: row for row, player_id in enumerate(ids.tolist())}
+
+    def realised_points(solution):
+        if not solution.starting_ids:
+            return numpy.nan
+        return realised[[rows[player_id] for player_id in solution.starting_ids]].sum() + realised[rows[solution.captain_id]]
+
+    optimizer = SquadOptimizer(ids, costs, positions, clubs, predictions)
+    selected, hindsight = optimizer.solve_many([Scenario('predicted'), Scenario('hindsight', points=realised)])
+    return {'selected_predicted_points': selected.predicted_points, 'selected_realised_points': realised_points(selected),
+            'hindsight_realised_points': realised_points(hindsight)}
+
+
+class Backtester():
+    """
+    Walk-forward evaluation over the feature partitions a `DataProcessor` wrote with `use_feature_store=True`.
+
+    For every test gameweek g, a fresh model is fitted on the partitions whose target window ended by g
+    (gw + horizon <= g) and scored on g's partition. Models see only `FOLD_FEATURES`, without the features
+    computed from the target's own rounds, so no realised points reach a fold's inputs. Folds for every
+    model, horizon and gameweek run in a process pool, and each worker memory-maps the partitions it needs from
+    the store rather than receiving them pickled.
+    """
+
+    def __init__(self, processor, min_train_gws=BACKTEST_MIN_TRAIN_GWS, max_workers=BACKTEST_MAX_WORKERS, select_squads=False):
+        """
+        Args:
+            processor (DataProcessor): A processor built with `use_feature_store=True`, for the horizons to test.
+            min_train_gws (int): Fewest earlier gameweeks a fold trains on; earlier test gameweeks are skipped.
+            max_workers (int): Processes fitting folds at once, capped at the CPU count. 1 runs the folds in this process.
+            select_squads (bool): Also select the optimal squad on each fold's predictions and score its realised points.
+        """
+        if processor.feature_store is None:
+            raise ValueError("Backtesting reads feature partitions; build the DataProcessor with use_feature_store=True")
+        self.processor = processor
+        self.feature_store = processor.feature_store
+        self.min_train_gws = min_train_gws
+        self.max_workers = min(max_workers, os.cpu_count() or 1)
+        self.teams = processor.data_obj.players['team'].astype(int).to_dict() if select_squads else None
+
+    def get_partitions(self, horizon):
+        """
+        Returns the stored (gw, gws_ahead) partitions of a horizon, in gameweek order.
+        """
+        partitions = []
+        for gw in range(self.processor.data_obj.start_gw, self.processor.data_obj.end_gw):
+            gws_ahead = self.processor.get_last_gw(gw, horizon) - gw
+            if gws_ahead > 0 and self.feature_store.has(gw, gws_ahead):
+                partitions.append((gw, gws_ahead))
+        return partitions
+
+    def get_folds(self, model_name, model_factory, horizon):
+        partitions = self.get_partitions(horizon)
+        folds = []
+        for test_gw, test_gws_ahead in partitions:
+            train = [(gw, gws_ahead) for gw, gws_ahead in partitions if gw + gws_ahead <= test_gw]
+            if len(train) < self.min_train_gws:
+                continue
+            folds.append(Fold(model_name, model_factory, horizon, (test_gw, test_gws_ahead), train, self.feature_store.features,
+                              self.feature_store.season, self.feature_store.base_root, self.teams))
+        return folds
+
+    @logger
+    def run(self, models=None, horizons=None):
+        """
+        Runs every fold for every model and horizon.
+
+        Args:
+            models (dict): Model name to a picklable callable returning an unfitted model with `fit` and `predict`.
+                Defaults to the notebook's model.
+            horizons (list): The horizons to test. Defaults to the processor's.
+
+        Returns:
+            pandas.DataFrame: One row per fold, ordered by model, horizon and gameweek.
+        """
+        models = models or {'default': make_default_model}
+        horizons = self.processor.horizons if horizons is None else horizons
+        folds = [fold for name, factory in models.items() for horizon in horizons for fold in self.get_folds(name, factory, horizon)]
+        logging.info(f"Running {len(folds)} walk-forward folds on {self.max_workers} workers")
+        if self.max_workers == 1:
+            results = [run_fold(fold) for fold in folds]
+        else:
+            # Forked workers inherit model factories defined interactively, which spawned ones could not import.
+            context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+            with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context) as executor:
+                results = list(executor.map(run_fold, folds))
+        return pandas.DataFrame(results)
+
+    @staticmethod
+    def summarize(results):
+        """
+        Returns the mean of each fold metric per model and horizon, for comparing them at a glance.
+        """
+        metrics = [column for column in ('mae', 'rmse', 'r2', 'selected_realised_points', 'hindsight_realised_points') if column in results.columns]
+        return results.groupby(['model', results['horizon'].astype(str)])[metrics].mean()
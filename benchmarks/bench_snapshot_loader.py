@@ -0,0 +1,65 @@
+"""
+Compares parse time and memory of the typed snapshot loader against the old dictionary/transpose path.
+
+Usage, from the repository root:
+    python -m benchmarks.bench_snapshot_loader [snapshot.json] [--players N] [--repeat R]
+
+Without a snapshot file the current bootstrap-static is fetched through the response cache. `--players`
+replicates the elements (with fresh IDs) to measure larger snapshots.
+"""
+from constants import CURRENT_STATS_FEATURES, POSSIBLE_FUTURE_FEATURES, ID_FEATURES, CREATED_AVG_FEATURES, SNAPSHOT_REQUIRED_FIELDS
+from snapshot_loader import load_elements_frame
+import argparse
+import logging
+import timeit
+import copy
+import json
+
+
+def scale_elements(elements, num_players):
+    scaled = []
+    while len(scaled) < num_players:
+        for element in elements[:num_players - len(scaled)]:
+            element = copy.copy(element)
+            element['id'] = len(scaled) + 1
+            scaled.append(element)
+    return scaled
+
+
+def legacy_load(elements):
+    from utils import process_dictdata_to_dataframe
+    df = process_dictdata_to_dataframe({element['id']: element for element in elements})
+    return df.set_index('id')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('snapshot', nargs='?', help='Path to a bootstrap-static JSON file')
+    parser.add_argument('--players', type=int, default=None, help='Number of players to scale the snapshot to')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    if args.snapshot:
+        with open(args.snapshot) as f:
+            snap = json.load(f)
+    else:
+        from utils import get_raw_season_stats_snap
+        snap = get_raw_season_stats_snap()
+    elements = snap['elements'] if args.players is None else scale_elements(snap['elements'], args.players)
+    features = CURRENT_STATS_FEATURES + POSSIBLE_FUTURE_FEATURES + ID_FEATURES + CREATED_AVG_FEATURES
+
+    cases = {
+        'legacy (dict + to_numeric + transpose)': lambda: legacy_load(elements),
+        'typed, all fields': lambda: load_elements_frame(elements),
+        'typed, feature fields only': lambda: load_elements_frame(elements, SNAPSHOT_REQUIRED_FIELDS + features),
+    }
+    print(f"{len(elements)} players, best of {args.repeat}")
+    for name, load in cases.items():
+        seconds = min(timeit.repeat(load, number=1, repeat=args.repeat))
+        memory = load().memory_usage(deep=True).sum()
+        print(f"{name:<42} {seconds * 1000:9.1f} ms {memory / 1e6:9.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Local stand-in for the FPL API and the Wayback Machine, for benchmarks and offline development.
+
+Serves bootstrap-static, fixtures, element-summary/{id}, entry/{id}/event/{gw}/picks, event/{gw}/live,
+leagues-classic/{id}/standings, Wayback captures of bootstrap-static
+(/web/{timestamp}/https://fantasy.premierleague.com/api/bootstrap-static/) and their CDX listing from a deterministic synthetic
+season of any size. Recorded payloads can be served instead by pointing
+`recorded_dir` at a directory of JSON files named after the URL path, e.g. `api_fixtures.json`.
+
+Latency and failure injection are configurable per server. Run standalone with:
+    python -m benchmarks.fake_api --players 600 --latency 0.05 --failure-rate 0.02
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+import multiprocessing
+import threading
+import argparse
+import zlib
+import random
+import time
+import json
+import os
+import re
+
+FPL_BASE = 'https://fantasy.premierleague.com'
+WAYBACK_BASE = 'https://web.archive.org'
+SEASON_START = datetime(2024, 8, 16, 17, 30)
+NUM_TEAMS = 20
+NUM_GWS = 38
+SQUAD_SHAPE = {1: 2, 2: 5, 3: 5, 4: 3}
+LEAGUE_PAGE_SIZE = 50
+
+
+class FakeFPLData():
+    """
+    A deterministic synthetic season: `num_players` players over 20 teams, a 38-gameweek fixture list with one
+    blank and one double gameweek, per-round player histories up to `current_gw`, and classic leagues of
+    `league_size` entries.
+    """
+
+    def __init__(self, num_players=600, current_gw=20, seed=0, league_size=200):
+        self.num_players = num_players
+        self.league_size = league_size
+        self.live_stats = {}
+        self.current_gw = current_gw
+        rng = random.Random(seed)
+        self.deadlines = {gw: SEASON_START + timedelta(days=7 * (gw - 1)) for gw in range(1, NUM_GWS + 1)}
+        self.fixtures = self._make_fixtures(rng)
+        self.players = [self._make_player(rng, player_id) for player_id in range(1, num_players + 1)]
+        self.histories = {player['id']: self._make_history(rng, player) for player in self.players}
+
+    def _make_fixtures(self, rng):
+        # Circle-method double round robin, then one fixture moved from gw 29 to gw 32 to give a blank and a double.
+        teams = list(range(1, NUM_TEAMS + 1))
+        rounds = []
+        for _ in range(NUM_TEAMS - 1):
+            rounds.append([(teams[i], teams[-1 - i]) for i in range(NUM_TEAMS // 2)])
+            teams = [teams[0]] + [teams[-1]] + teams[1:-1]
+        rounds += [[(away, home) for home, away in fixtures] for fixtures in rounds]
+        fixtures = []
+        for gw, pairs in enumerate(rounds, start=1):
+            for home, away in pairs:
+                fixtures.append({
+                    'id': len(fixtures) + 1, 'event': gw, 'team_h': home, 'team_a': away,
+                    'team_h_difficulty': rng.randint(2, 5), 'team_a_difficulty': rng.randint(2, 5),
+                    'finished': gw < self.current_gw, 'kickoff_time': (self.deadlines[gw] + timedelta(hours=2)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                })
+        moved = next(fixture for fixture in fixtures if fixture['event'] == 29)
+        moved['event'] = 32
+        return fixtures
+
+    def _make_player(self, rng, player_id):
+        element_type = rng.choices([1, 2, 3, 4], weights=[2, 5, 5, 3])[0]
+        return {
+            'id': player_id, 'web_name': f"Player{player_id}", 'team': (player_id - 1) % NUM_TEAMS + 1,
+            'element_type': element_type, 'now_cost': rng.randint(40, 130), 'status': rng.choice('aaaaaaaadi'),
+            'quality': rng.random(),
+        }
+
+    def _make_history(self, rng, player):
+        history = []
+        for fixture in self.fixtures:
+            if fixture['event'] >= self.current_gw or player['team'] not in (fixture['team_h'], fixture['team_a']):
+                continue
+            minutes = rng.choice([0, 0, 90, 90, 90, 60, 20]) if player['quality'] > 0.2 else rng.choice([0, 0, 0, 10])
+            points = (rng.randint(0, 3) + int(player['quality'] * rng.randint(0, 10))) if minutes else 0
+            history.append({'element': player['id'], 'fixture': fixture['id'], 'round': fixture['event'],
+                            'total_points': points, 'minutes': minutes})
+        return history
+
+    def element(self, player, gw):
+        """Returns a bootstrap-static element for a player as it stood before gameweek `gw`'s deadline."""
+        played = [row for row in self.histories[player['id']] if row['round'] < gw]
+        points = sum(row['total_points'] for row in played)
+        minutes = sum(row['minutes'] for row in played)
+        recent = [row['total_points'] for row in played[-4:]]
+        return {
+            'id': player['id'], 'web_name': player['web_name'], 'team': player['team'], 'team_code': player['team'],
+            'element_type': player['element_type'], 'now_cost': player['now_cost'], 'status': player['status'],
+            'minutes': minutes, 'total_points': points,
+            'points_per_game': f"{points / max(len(played), 1):.1f}", 'form': f"{sum(recent) / max(len(recent), 1):.1f}",
+            'selected_by_percent': f"{player['quality'] * 40:.1f}", 'ict_index': f"{player['quality'] * minutes / 10:.1f}",
+            'transfers_in': int(player['quality'] * 1e6), 'transfers_out': int((1 - player['quality']) * 5e5),
+            'cost_change_event': 0, 'clean_sheets': sum(1 for row in played if row['minutes'] >= 60 and row['total_points'] >= 6),
+            'chance_of_playing_next_round': None if player['status'] == 'a' else 75,
+        }
+
+    def events(self, gw):
+        return [{'id': event, 'name': f"Gameweek {event}", 'deadline_time': deadline.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                 'finished': event < gw, 'is_current': event == gw - 1, 'is_next': event == gw, 'is_previous': event == gw - 2}
+                for event, deadline in self.deadlines.items()]
+
+    def teams(self):
+        return [{'id': team, 'name': f"Team{team}", 'short_name': f"T{team:02d}",
+                 **{f"strength_{kind}_{venue}": 1000 + 10 * team for kind in ('overall', 'attack', 'defence') for venue in ('home', 'away')}}
+                for team in range(1, NUM_TEAMS + 1)]
+
+    def bootstrap_static(self, gw=None):
+        """Returns bootstrap-static as it stood before gameweek `gw`'s deadline, defaulting to the live one."""
+        gw = self.current_gw + 1 if gw is None else gw
+        return {'events': self.events(gw), 'teams': self.teams(), 'elements': [self.element(player, gw) for player in self.players],
+                'element_types': [{'id': element_type, 'squad_select': count} for element_type, count in SQUAD_SHAPE.items()]}
+
+    def gw_for_timestamp(self, timestamp):
+        """Returns the first gameweek whose deadline is after a 'YYYYMMDDhhmmss' Wayback timestamp."""
+        moment = datetime.strptime(timestamp.ljust(14, '0')[:14], "%Y%m%d%H%M%S")
+        return next((gw for gw, deadline in self.deadlines.items() if deadline > moment), NUM_GWS + 1)
+
+    def capture_timestamps(self):
+        """Returns the Wayback capture timestamps of bootstrap-static: a day and two hours before each played
+        gameweek's deadline, and an hour after it."""
+        offsets = (timedelta(hours=-26), timedelta(hours=-2), timedelta(hours=1))
+        return [(self.deadlines[gw] + offset).strftime("%Y%m%d%H%M%S") for gw in range(1, self.current_gw + 1) for offset in offsets]
+
+    def cdx(self, query):
+        """Returns the CDX JSON listing of the captures between the query's 'from' and 'to' timestamp prefixes."""
+        params = parse_qs(query)
+        low, high = params.get('from', [''])[0], params.get('to', ['9'])[0]
+        return [['timestamp']] + [[timestamp] for timestamp in self.capture_timestamps() if low <= timestamp[:len(low)] and timestamp[:len(high)] <= high]
+
+    def element_summary(self, player_id):
+        player_team = self.players[player_id - 1]['team']
+        upcoming = [{'event': fixture['event'], 'team_h': fixture['team_h'], 'team_a': fixture['team_a'],
+                     'difficulty': fixture['team_h_difficulty'] if fixture['team_h'] == player_team else fixture['team_a_difficulty']}
+                    for fixture in self.fixtures
+                    if fixture['event'] >= self.current_gw and player_team in (fixture['team_h'], fixture['team_a'])]
+        return {'history': self.histories[player_id], 'fixtures': upcoming}
+
+    def event_live(self, gw):
+        """
+        Returns event/{gw}/live: each player's points and minutes in the gameweek so far, from their history plus
+        `live_stats`, which a test can update between polls to simulate a match in progress. Updates only reach a
+        server started with `in_process=True`: a forked server keeps the data as it was when it started.
+        """
+        elements = []
+        for player in self.players:
+            rows = [row for row in self.histories[player['id']] if row['round'] == gw]
+            stats = {'minutes': sum(row['minutes'] for row in rows), 'total_points': sum(row['total_points'] for row in rows)}
+            stats.update(self.live_stats.get(player['id'], {}))
+            elements.append({'id': player['id'], 'stats': stats, 'explain': []})
+        return {'elements': elements}
+
+    def picks(self, entry_id, gw):
+        rng = random.Random(entry_id * 100 + gw)
+        squad = {}
+        for element_type, count in SQUAD_SHAPE.items():
+            pool = [player['id'] for player in self.players if player['element_type'] == element_type]
+            squad[element_type] = rng.sample(pool, min(count, len(pool)))
+        # A 1-4-4-2 XI followed by one bench player per position, with a random starter as captain.
+        starters = squad[1][:1] + squad[2][:4] + squad[3][:4] + squad[4][:2]
+        bench = squad[1][1:] + squad[2][4:] + squad[3][4:] + squad[4][2:]
+        captain = rng.choice(starters)
+        return {'picks': [{'element': element, 'position': position + 1,
+                           'multiplier': 0 if position >= len(starters) else 2 if element == captain else 1,
+                           'is_captain': element == captain}
+                          for position, element in enumerate(starters + bench)]}
+
+    def league_standings(self, league_id, page):
+        """A classic league of `league_size` entries, with entry IDs from league_id * 1000, 50 per page."""
+        entries = [league_id * 1000 + i for i in range(self.league_size)]
+        results = entries[(page - 1) * LEAGUE_PAGE_SIZE:page * LEAGUE_PAGE_SIZE]
+        return {'league': {'id': league_id, 'name': f"League {league_id}"},
+                'standings': {'page': page, 'has_next': page * LEAGUE_PAGE_SIZE < len(entries),
+                              'results': [{'entry': entry, 'entry_name': f"Team {entry}", 'rank': (page - 1) * LEAGUE_PAGE_SIZE + i + 1}
+                                          for i, entry in enumerate(results)]}}
+
+
+class FakeAPIServer():
+    """
+    Threaded HTTP server answering FPL and Wayback URLs from a `FakeFPLData`, in a child process or a background thread.
+
+    Use as a context manager; `base_url` is the server's address and `rewrites` the (prefix, replacement)
+    pairs that point a `cache.ResponseCache` at it. Every response also carries an ETag so conditional
+    requests get a 304 when nothing changed.
+    """
+
+    def __init__(self, data=None, latency=0.0, failure_rate=0.0, seed=0, recorded_dir=None, port=0, in_process=False):
+        self.data = data or FakeFPLData()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.recorded_dir = recorded_dir
+        # A server thread in the client's process competes with the client's fetch threads for the GIL and
+        # skews the timings, so by default the server runs in a forked child process.
+        self.in_process = in_process or 'fork' not in multiprocessing.get_all_start_methods()
+        self._request_count = multiprocessing.Value('i', 0)
+        self._rng = random.Random(seed)
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self._server.daemon_threads = True
+        self._runner = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def rewrites(self):
+        return [(WAYBACK_BASE, self.base_url), (FPL_BASE, self.base_url)]
+
+    @property
+    def request_count(self):
+        return self._request_count.value
+
+    def start(self):
+        if self.in_process:
+            self._runner = threading.Thread(target=self._server.serve_forever, daemon=True)
+        else:
+            self._runner = multiprocessing.get_context('fork').Process(target=self._server.serve_forever, daemon=True)
+        self._runner.start()
+        return self
+
+    def stop(self):
+        if self.in_process:
+            self._server.shutdown()
+        else:
+            self._runner.terminate()
+            self._runner.join()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def route(self, path):
+        """Returns the JSON payload for a request path, or None if the path is unknown."""
+        if self.recorded_dir is not None:
+            recorded = os.path.join(self.recorded_dir, path.strip('/').replace('/', '_').replace(':', '') + '.json')
+            if os.path.exists(recorded):
+                with open(recorded) as f:
+                    return json.load(f)
+        if match := re.fullmatch(r'/web/(\d+)[a-z_]*/https?://fantasy\.premierleague\.com/api/bootstrap-static/?', path):
+            return self.data.bootstrap_static(self.data.gw_for_timestamp(match.group(1)))
+        if match := re.fullmatch(r'/cdx/search/cdx\?(.*)', path):
+            return self.data.cdx(match.group(1))
+        if path == '/api/bootstrap-static/':
+            return self.data.bootstrap_static()
+        if path == '/api/fixtures/':
+            return self.data.fixtures
+        if match := re.fullmatch(r'/api/element-summary/(\d+)/', path):
+            player_id = int(match.group(1))
+            return self.data.element_summary(player_id) if 1 <= player_id <= self.data.num_players else None
+        if match := re.fullmatch(r'/api/entry/(\d+)/event/(\d+)/picks/', path):
+            return self.data.picks(int(match.group(1)), int(match.group(2)))
+        if match := re.fullmatch(r'/api/event/(\d+)/live/', path):
+            return self.data.event_live(int(match.group(1)))
+        if match := re.fullmatch(r'/api/leagues-classic/(\d+)/standings/\?page_standings=(\d+)', path):
+            return self.data.league_standings(int(match.group(1)), int(match.group(2)))
+        return None
+
+    def _should_fail(self):
+        with self._request_count.get_lock():
+            self._request_count.value += 1
+            return self._rng.random() < self.failure_rate
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                if server._should_fail():
+                    self.send_error(503, 'Injected failure')
+                    return
+                payload = server.route(self.path)
+                if payload is None:
+                    self.send_error(404)
+                    return
+                body = json.dumps(payload).encode('utf-8')
+                etag = f'"{zlib.crc32(body):x}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=600)
+    parser.add_argument('--current-gw', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay added to every response')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered with a 503')
+    parser.add_argument('--recorded-dir', default=None)
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+    server = FakeAPIServer(FakeFPLData(args.players, args.current_gw), args.latency, args.failure_rate,
+                           recorded_dir=args.recorded_dir, port=args.port)
+    print(f"Serving fake FPL/Wayback API on {server.base_url}")
+    server.start()
+    try:
+        server._runner.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Times each pipeline stage against the local fake FPL/Wayback API at several player counts and gameweek
+ranges, and saves the results as JSON so runs on different commits can be compared.
+
+Usage, from the repository root:
+    python -m benchmarks.run_benchmarks --players 200 600 --range-weeks 3 10 --latency 0.02
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<old>.json
+
+Stages:
+    snapshot_parse        typed load of one bootstrap-static snapshot
+    data_container_cold   DataContainer with an empty response cache (live data, fixtures, Wayback range)
+    data_processor_cold   DataProcessor straight after, fetching every element-summary
+    data_processor_warm   DataProcessor again with only the on-disk cache warm
+    data_processor_multi  DataProcessor for horizons 1, 3 and 'dynamic' in one pass, cache warm
+    model_load            loading and validating fpl_model.pkl with predictor.Predictor; a failure is reported as its status
+    model_scoring         Predictor scoring with fpl_model.pkl, run when model_load succeeded
+    squad_selection       the wildcard squad selection from the notebook
+    squad_milp            exact squad, XI and captain selection with optimizer.SquadOptimizer
+    simulation            10k Monte Carlo outcomes for the pool with simulation.PointsSimulator, plus the squad's summary
+"""
+from scipy.optimize import linprog
+from datetime import datetime
+import subprocess
+import tempfile
+import argparse
+import platform
+import logging
+import random
+import shutil
+import numpy
+import time
+import json
+import os
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def select_squad_linprog(predicted_points, costs, positions, budget=100):
+    """The notebook's wildcard selection (relaxed linprog over 0-1 bounds, rounded at 0.5) with a budget row added."""
+    position_constraints = {1: 2, 2: 5, 3: 5, 4: 3}
+    A_eq = [(positions == position).astype(int) for position in position_constraints] + [numpy.ones(len(costs))]
+    b_eq = list(position_constraints.values()) + [15]
+    result = linprog(-predicted_points, A_ub=[costs / 10.0], b_ub=[budget], A_eq=numpy.array(A_eq), b_eq=numpy.array(b_eq),
+                     bounds=[(0, 1)] * len(costs), method='highs')
+    return numpy.where(result.x >= 0.5)[0] if result.success else None
+
+
+class StageTimer():
+    def __init__(self, server, results, players, range_weeks):
+        self.server, self.results = server, results
+        self.players, self.range_weeks = players, range_weeks
+
+    def run(self, stage, func):
+        requests_before = self.server.request_count
+        start = time.perf_counter()
+        try:
+            value = func()
+            status = 'ok'
+        except Exception as e:
+            value, status = None, f"error: {e}"
+        seconds = time.perf_counter() - start
+        self.results.append({'stage': stage, 'players': self.players, 'range_weeks': self.range_weeks,
+                             'seconds': round(seconds, 4), 'requests': self.server.request_count - requests_before, 'status': status})
+        print(f"{stage:<22} players={self.players:<5} range_weeks={self.range_weeks:<3} {seconds:8.3f}s "
+              f"{self.results[-1]['requests']:6d} requests  {status}")
+        return value
+
+
+def run_case(players, range_weeks, args, results, metrics):
+    import utils
+    from metrics import METRICS
+    from cache import ResponseCache
+    from data_collection import DataContainer, DataProcessor
+    from snapshot_loader import load_elements_frame
+    from benchmarks.fake_api import FakeAPIServer, FakeFPLData
+    from optimizer import SquadOptimizer
+    from simulation import PointsSimulator
+    from predictor import Predictor
+
+    data = FakeFPLData(num_players=players, current_gw=args.current_gw, seed=args.seed)
+    cache_dir = tempfile.mkdtemp(prefix='fpl_bench_cache_')
+    METRICS.enable()
+    METRICS.reset()
+    try:
+        with FakeAPIServer(data, latency=args.latency, failure_rate=args.failure_rate, seed=args.seed) as server:
+            utils.RESPONSE_CACHE = ResponseCache(cache_dir=cache_dir, rewrites=server.rewrites)
+            timer = StageTimer(server, results, players, range_weeks)
+
+            snapshot = data.bootstrap_static()
+            timer.run('snapshot_parse', lambda: load_elements_frame(snapshot['elements']))
+            data_obj = timer.run('data_container_cold', lambda: DataContainer(lookback_weeks=range_weeks, range_weeks=range_weeks))
+            if data_obj is None:
+                return
+            processed = timer.run('data_processor_cold', lambda: DataProcessor(data_obj, horizon=args.horizon))
+            utils.RESPONSE_CACHE.clear_memory()
+            timer.run('data_processor_warm', lambda: DataProcessor(data_obj, horizon=args.horizon))
+            timer.run('data_processor_multi', lambda: DataProcessor(data_obj, horizon=[1, 3, 'dynamic']))
+            if processed is None:
+                return
+
+            X = processed.training_data[0].fillna(0)
+            X = X.loc[:, ~X.columns.duplicated()]
+            # A model that fails to load is recorded as a failed model_load stage rather than skipped
+            predictor = timer.run('model_load', lambda: Predictor(args.model, auto_reload=False))
+            if predictor is not None:
+                timer.run('model_scoring', lambda: predictor.predict(X))
+
+            rng = random.Random(args.seed)
+            predicted = X['points_per_game'].astype(float).values + [rng.random() for _ in range(len(X))]
+            timer.run('squad_selection', lambda: select_squad_linprog(
+                predicted, X['now_cost'].astype(float).values, X['element_type'].astype(int).values))
+            pool = data_obj.players
+            pool_points = pool['points_per_game'].astype(float).values + [rng.random() for _ in range(len(pool))]
+            squad = timer.run('squad_milp', lambda: SquadOptimizer(pool.index, pool['now_cost'], pool['element_type'], pool['team'],
+                                                                   pool_points).solve())
+            history_store = utils.get_player_history_store(pool.index, processed.history_store)
+            if squad is not None:
+                timer.run('simulation', lambda: PointsSimulator(history_store, pool.index, pool['team'], pool_points, seed=args.seed)
+                          .evaluate_squads([squad]))
+    finally:
+        metrics.append({'players': players, 'range_weeks': range_weeks, **METRICS.snapshot()})
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda row: (row['stage'], row['players'], row['range_weeks'])
+    old = {key(row): row['seconds'] for row in baseline['results']}
+    print(f"\nCompared with {baseline['commit'][:10]} ({baseline_path}):")
+    for row in current['results']:
+        if key(row) in old and old[key(row)]:
+            ratio = row['seconds'] / old[key(row)]
+            print(f"{row['stage']:<22} players={row['players']:<5} range_weeks={row['range_weeks']:<3} "
+                  f"{old[key(row)]:8.3f}s -> {row['seconds']:8.3f}s  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, nargs='+', default=[200, 600])
+    parser.add_argument('--range-weeks', type=int, nargs='+', default=[3, 10])
+    parser.add_argument('--current-gw', type=int, default=20)
+    parser.add_argument('--horizon', default=3, type=lambda value: value if value == 'dynamic' else int(value))
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay the fake server adds to every response')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests the fake server fails with a 503')
+    parser.add_argument('--requests-per-second', type=float, default=0,
+                        help='Client rate limit during the run, 0 for none so the limiter does not dominate the timings')
+    parser.add_argument('--model', default='fpl_model.pkl')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Where to write the JSON results. Defaults to benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', default=None, help='A previous results file to compare against')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # The fetch stages bind their rate limits from constants at import time, so set them before importing the pipeline.
+    import constants
+    constants.FETCH_REQUESTS_PER_SECOND = args.requests_per_second or None
+    constants.WAYBACK_REQUESTS_PER_SECOND = args.requests_per_second or None
+
+    results, metrics = [], []
+    for players in args.players:
+        for range_weeks in args.range_weeks:
+            run_case(players, range_weeks, args, results, metrics)
+
+    commit = get_commit()
+    report = {
+        'commit': commit, 'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+        'metrics': metrics,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit[:10]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+from constants import CACHE_DIR, CACHE_MEMORY_SIZE, CACHE_TTLS, DEFAULT_CACHE_TTL, FETCH_MAX_WORKERS, FETCH_TIMEOUT
+from requests.adapters import HTTPAdapter
+from metrics import METRICS
+from collections import OrderedDict
+import threading
+import requests
+import logging
+import hashlib
+import time
+import json
+import os
+import re
+
+
+class OfflineCacheMiss(Exception):
+    """Raised when offline mode is on and a URL has never been stored."""
+
+
+class ResponseCache():
+    """
+    Disk-backed store for JSON API responses with a bounded in-memory LRU in front of it.
+
+    Response bodies are content-addressed (sha256 of the body) under `objects/`, and each URL has a small
+    index entry under `index/` pointing at its body together with the ETag/Last-Modified headers and the
+    time it was fetched. Stale entries are revalidated with If-None-Match/If-Modified-Since so an unchanged
+    payload costs a 304 rather than a full download.
+
+    `rewrites` is a list of (prefix, replacement) pairs applied to a URL just before it is requested, e.g. to
+    point the pipeline at a local stand-in server. Responses are still stored under the original URL.
+    `timeout` is the number of seconds a request may wait to connect or between bytes before it fails.
+
+    In offline mode no HTTP request is ever made: every URL is served from the store regardless of age and
+    a URL that was never stored raises `OfflineCacheMiss`.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttls=CACHE_TTLS, memory_size=CACHE_MEMORY_SIZE, offline=None, session=None, rewrites=(),
+                 timeout=FETCH_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.memory_size = memory_size
+        self.offline = os.environ.get('FPL_OFFLINE', '') not in ('', '0') if offline is None else offline
+        self.session = session or self.make_session()
+        self.rewrites = list(rewrites)
+        self.timeout = timeout
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_session(pool_size=FETCH_MAX_WORKERS):
+        """
+        Creates a session whose connection pool is large enough for every fetch worker to keep its connection alive.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def rewrite(self, url):
+        for prefix, replacement in self.rewrites:
+            if url.startswith(prefix):
+                return replacement + url[len(prefix):]
+        return url
+
+    def ttl_for(self, url):
+        """
+        Returns the time-to-live in seconds for a URL, or None if responses for it never go stale.
+        """
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return DEFAULT_CACHE_TTL
+
+    def is_fresh(self, url, entry):
+        ttl = self.ttl_for(url)
+        return ttl is None or time.time() - entry['fetched_at'] < ttl
+
+    def has_fresh(self, url):
+        """
+        Returns True if `get_json(url)` would be answered from memory or disk without a network request.
+        """
+        with self._lock:
+            cached = self._memory.get(url)
+            if cached is not None and (self.offline or self.is_fresh(url, cached[0])):
+                return True
+        entry = self._read_entry(url)
+        return entry is not None and (self.offline or self.is_fresh(url, entry))
+
+    def get_json(self, url):
+        """
+        Returns the JSON-decoded response for a URL, from memory, disk or the network in that order.
+
+        Args:
+            url (str): The URL to query.
+
+        Returns:
+            dict: The JSON-decoded response.
+
+        Raises:
+            OfflineCacheMiss: If offline mode is on and the URL is not in the store.
+            Exception: If the response status code is neither 200 nor 304.
+        """
+        with self._lock:
+            cached = self._memory.get(url)
+            if cached is not None and (self.offline or self.is_fresh(url, cached[0])):
+                self._memory.move_to_end(url)
+                logging.info(f"🟢 Memory cache hit for url:{url}")
+                METRICS.increment('cache_memory_hits')
+                return cached[1]
+
+        entry = self._read_entry(url)
+        if entry is not None and (self.offline or self.is_fresh(url, entry)):
+            data = self._read_object(entry['object'])
+            if data is not None:
+                logging.info(f"🟢 Disk cache hit for url:{url}")
+                METRICS.increment('cache_disk_hits')
+                self._remember(url, entry, data)
+                return data
+            entry = None
+
+        if self.offline:
+            raise OfflineCacheMiss(f"Offline mode: no stored response for URL: {url}")
+
+        logging.info(f"🔵 Cache miss for url:{url}, querying API")
+        METRICS.increment('cache_misses')
+        return self._fetch(url, entry)
+
+    def poll(self, url):
+        """
+        Requests a URL conditionally whatever the age of the stored response, for payloads that are polled while
+        they change (e.g. during a live gameweek). An unchanged payload costs a 304.
+
+        Returns:
+            tuple: The JSON-decoded response and whether its body differs from the previously stored one.
+        """
+        with self._lock:
+            cached = self._memory.get(url)
+        entry = cached[0] if cached is not None else self._read_entry(url)
+        if self.offline:
+            return self.get_json(url), False
+        previous = entry['object'] if entry is not None else None
+        data = self._fetch(url, dict(entry) if entry is not None else None)
+        current = self._read_entry(url)
+        return data, current is None or current['object'] != previous
+
+    def _fetch(self, url, entry):
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        results = self.session.get(self.rewrite(url), headers=headers, timeout=self.timeout)
+        METRICS.increment('http_requests')
+
+        if results.status_code == 304 and entry is not None:
+            data = self._read_object(entry['object'])
+            if data is not None:
+                logging.info(f"🟡 Revalidated unchanged response for url:{url}")
+                METRICS.increment('cache_revalidated')
+                entry['fetched_at'] = time.time()
+                self._write_entry(url, entry)
+                self._remember(url, entry, data)
+                return data
+            # The body went missing from the store, so the 304 is useless to us.
+            return self._fetch(url, None)
+
+        if results.status_code != 200:
+            raise requests.HTTPError(f"Failed to fetch data: {results.status_code}, URL: {url}", response=results)
+
+        content = results.content
+        METRICS.increment('bytes_downloaded', len(content))
+        data = json.loads(content.decode('utf-8'))
+        entry = {
+            'url': url,
+            'object': self._write_object(content),
+            'etag': results.headers.get('ETag'),
+            'last_modified': results.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        self._write_entry(url, entry)
+        self._remember(url, entry, data)
+        return data
+
+    def _remember(self, url, entry, data):
+        with self._lock:
+            self._memory[url] = (entry, data)
+            self._memory.move_to_end(url)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _index_path(self, url):
+        return os.path.join(self.cache_dir, 'index', hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest + '.json')
+
+    def _read_entry(self, url):
+        try:
+            with open(self._index_path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, url, entry):
+        self._atomic_write(self._index_path(url), json.dumps(entry).encode('utf-8'))
+
+    def _read_object(self, digest):
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                return json.loads(f.read().decode('utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def _write_object(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            self._atomic_write(path, content)
+        return digest
+
+    @staticmethod
+    def _atomic_write(path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
@@ -9,9 +9,79 @@ POSSIBLE_FUTURE_FEATURES = [
 ]
 CREATED_AVG_FEATURES = ["points_per_90","adjusted_points_per_90",]
 ID_FEATURES = ['now_cost','element_type','web_name','status']
+# Columns the model is fitted on, in order: the training frame's features with ID_FEATURES dropped.
+MODEL_FEATURES = [feature for feature in CURRENT_STATS_FEATURES+POSSIBLE_FUTURE_FEATURES+CREATED_AVG_FEATURES if feature not in ID_FEATURES]
 UNUSED_FEATURES = [    "strength_overall_home",
     "strength_overall_away",
     "strength_attack_home",
     "strength_attack_away",
     "strength_defence_home",
     "strength_defence_away",]  
+
+CACHE_DIR = '.fpl_cache'
+CACHE_MEMORY_SIZE = 1024
+# (url regex, ttl in seconds). None means the response never goes stale, which is the case for archived captures.
+CACHE_TTLS = [
+    (r'^https://web\.archive\.org/web/\d+', None),
+    (r'^https://web\.archive\.org/cdx/', 24 * 60 * 60),
+    (r'/api/element-summary/\d+/', 6 * 60 * 60),
+    (r'/api/entry/\d+/event/\d+/picks/', 60 * 60),
+    (r'/api/leagues-classic/\d+/standings/', 60 * 60),
+    (r'/api/event/\d+/live/', 60),
+    (r'/api/fixtures/', 60 * 60),
+    (r'/api/bootstrap-static/', 10 * 60),
+]
+DEFAULT_CACHE_TTL = 10 * 60
+
+FETCH_MAX_WORKERS = 8
+FETCH_REQUESTS_PER_SECOND = 10
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.5
+FETCH_BATCH_SIZE = 100
+FETCH_TIMEOUT = 30  # seconds to wait for a connection or for the server to send data
+# Entry picks are small and cached for an hour, so a league's worth of them can be fetched faster than bulk data.
+PICKS_REQUESTS_PER_SECOND = 50
+
+WAYBACK_MAX_WORKERS = 4
+WAYBACK_REQUESTS_PER_SECOND = 2
+# Hours added to a gameweek's requested capture timestamp, in the order they are tried when that capture fails.
+WAYBACK_FALLBACK_OFFSETS_HOURS = [6, -12, -24, -48]
+WAYBACK_CDX_URL = 'https://web.archive.org/cdx/search/cdx'
+# Captures of a gameweek's window tried in turn, latest first, when the one before the deadline fails.
+WAYBACK_MAX_CAPTURE_CANDIDATES = 3
+
+FEATURE_STORE_DIR = '.fpl_features'
+SNAPSHOT_ARCHIVE_DIR = '.fpl_snapshots'
+
+# Seconds between polls of bootstrap-static and event/{gw}/live during a live gameweek.
+LIVE_POLL_INTERVAL = 60
+
+BACKTEST_MAX_WORKERS = 4
+# Fewest earlier gameweeks a walk-forward fold trains on.
+BACKTEST_MIN_TRAIN_GWS = 3
+# Bump whenever the way features are computed changes, so stored partitions from older code are not reused.
+FEATURE_SCHEMA_VERSION = 2
+
+# Element fields the pipeline itself needs, loaded whatever the feature set.
+SNAPSHOT_REQUIRED_FIELDS = ['id','team','minutes','selected_by_percent','status','web_name','element_type','now_cost']
+
+MODEL_PATH = 'fpl_model.pkl'
+PREDICTION_CACHE_SIZE = 256
+
+# Squad rules: players per position (element_type) in a 15-player squad, players allowed from one club,
+# and points deducted for each transfer beyond the free ones.
+SQUAD_POSITION_COUNTS = {1: 2, 2: 5, 3: 5, 4: 3}
+MAX_PLAYERS_PER_CLUB = 3
+TRANSFER_HIT_COST = 4
+# (min, max) starters per position in the starting XI.
+STARTING_POSITION_LIMITS = {1: (1, 1), 2: (3, 5), 3: (2, 5), 4: (1, 3)}
+STARTING_XI_SIZE = 11
+# Weight of a bench player's predicted points in the squad objective, relative to a starter's.
+BENCH_WEIGHT = 0.1
+SQUAD_BUDGET = 1000
+# Share of a mini-league owning a player at or below which the player counts as a differential.
+DIFFERENTIAL_OWNERSHIP = 0.1
+
+# Outcome scenarios drawn per player by the Monte Carlo simulator, and the percentiles it reports.
+SIMULATION_COUNT = 10000
+SIMULATION_PERCENTILES = [5, 25, 50, 75, 95]
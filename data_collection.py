@@ -3,117 +3,197 @@ from utils import (
     get_raw_fixture_data,
     get_gameweek_to_datestr_mapping,
     get_current_gameweek,
-    get_raw_historic_player_stats_snap,
     logger,
     get_dynamic_horizon,
-    add_extra_features,
-    CURRENT_TEAM_IDS,
-    update_current_team_ids
+    get_player_history_store,
+    get_season_start_year,
 )
-from constants import RAW_PLAYER_STATS_URL,CURRENT_STATS_FEATURES,ID_FEATURES,POSSIBLE_FUTURE_FEATURES,CREATED_AVG_FEATURES
+from features import FeatureEvaluator
+from wayback import load_snapshot_range, SnapshotStatus, CaptureIndex
+from snapshot_archive import SnapshotArchive
+from feature_store import FeatureStore
+from team_context import TeamContext
+from snapshot_loader import with_object_categoricals
+from constants import CURRENT_STATS_FEATURES,ID_FEATURES,POSSIBLE_FUTURE_FEATURES,CREATED_AVG_FEATURES
 import pandas
 import logging
     
 
 class DataContainer():
     
-    def __init__(self,lookback_weeks = 10, range_weeks = 10,):
+    def __init__(self,lookback_weeks = 10, range_weeks = 10, team_context = None, use_snapshot_archive = False, use_capture_index = True):
         self.range_weeks = range_weeks
+        self.team_context = team_context or TeamContext()
         self.players,self.id_to_pos_map,self.raw_season_stats_snap = get_player_data()
         self.events = self.raw_season_stats_snap['events']
+        self.snapshot_archive = SnapshotArchive(get_season_start_year(self.events)) if use_snapshot_archive else None
         self.raw_fixture_data = get_raw_fixture_data()
+        self.capture_candidates = self.get_capture_candidates() if use_capture_index else None
+        # Gameweeks without a capture of their own in the index keep the guessed timestamp and its fallbacks
         self.gameweek_to_datestr_mapping = get_gameweek_to_datestr_mapping(self.events)
+        if self.capture_candidates is not None:
+            self.gameweek_to_datestr_mapping.update({gw: captures[0] for gw, captures in self.capture_candidates.items()})
         self.current_gameweek = get_current_gameweek(self.events)
         self.start_gw = self.current_gameweek - lookback_weeks
         self.end_gw = self.start_gw + range_weeks
         self.range_historic_player_stats_snap = self.get_range_historic_player_stats_snap(self.start_gw, self.end_gw)       
     
+    def get_capture_candidates(self):
+        """
+        Returns each gameweek's latest archive captures before its deadline from the season's `CaptureIndex`, or
+        None if the capture index could not be fetched. Capture timestamps are guessed from the deadlines for every
+        gameweek without captures.
+        """
+        try:
+            return CaptureIndex.fetch(get_season_start_year(self.events)).get_gameweek_candidates(self.events)
+        except Exception as e:
+            logging.warning(f"Could not fetch the capture index, guessing capture timestamps instead: {e}")
+            return None
+
     @logger
     def get_range_historic_player_stats_snap(self,start_gw,end_gw):
         """
-        Fetches historic player statistics snapshot from the web archive for a given date.
+        Fetches the historic player statistics snapshots from the web archive for gameweeks [start_gw, end_gw),
+        concurrently and with fallback to earlier captures (or, without a capture index, neighbouring timestamps). The per-gameweek outcome is kept
+        in `self.snapshot_report`.
+
+        With the snapshot archive on, gameweeks already archived are not fetched, fetched snapshots are archived,
+        and every gameweek is held as a lazy `ArchivedSnapshot` instead of its raw JSON.
 
         Args:
-            date_str (str): The date string in 'YYYYMMDD' format to specify the snapshot date. Defaults to '20250331'.
+            start_gw (int): The first gameweek to fetch.
+            end_gw (int): The gameweek to stop before.
 
         Returns:
-            dict: The JSON-decoded response containing historic player stats.
+            dict: A dictionary mapping gameweeks to JSON-decoded or archived snapshots, for the gameweeks that could be loaded.
         """
-
-        range_historic_player_stats_snap = {}
-        for i in range(start_gw,end_gw):
-            date_str = self.gameweek_to_datestr_mapping[i]
-            try:
-                range_historic_player_stats_snap[i] = get_raw_historic_player_stats_snap(date_str)
-            except Exception as e:
-                print(f"Failed to fetch data: {e}, URL: https://web.archive.org/web/{date_str}/{RAW_PLAYER_STATS_URL}")
-        
-        return range_historic_player_stats_snap
+        if self.snapshot_archive is None:
+            range_historic_player_stats_snap, self.snapshot_report = load_snapshot_range(self.gameweek_to_datestr_mapping,start_gw,end_gw,candidates=self.capture_candidates)
+            return range_historic_player_stats_snap
+        archived = {gw: self.snapshot_archive.get(gw) for gw in range(start_gw, end_gw) if self.snapshot_archive.has(gw)}
+        fetched, self.snapshot_report = load_snapshot_range(self.gameweek_to_datestr_mapping,start_gw,end_gw,skip_gws=archived,candidates=self.capture_candidates)
+        for gw, snap in fetched.items():
+            archived[gw] = self.snapshot_archive.write(gw, snap)
+        for gw in archived:
+            self.snapshot_report.setdefault(gw, SnapshotStatus(gw=gw, status='archived'))
+        return dict(sorted(archived.items()))
 
 class DataProcessor():
     
-    def __init__( self, data_obj=None, features=CURRENT_STATS_FEATURES+POSSIBLE_FUTURE_FEATURES+ID_FEATURES+CREATED_AVG_FEATURES,horizon = 'dynamic', next_week_pred = False):
+    def __init__( self, data_obj=None, features=CURRENT_STATS_FEATURES+POSSIBLE_FUTURE_FEATURES+ID_FEATURES+CREATED_AVG_FEATURES,horizon = 'dynamic', next_week_pred = False, use_feature_store = False, team_context = None):
+        """
+        Builds the training data for one horizon, or for several in a single pass over each gameweek's snapshot.
+
+        Args:
+            horizon (int, str or collection): The number of gameweeks the target sums over, or 'dynamic' for
+                `get_dynamic_horizon`. A list/tuple/set of horizons builds every variant from the same parsed
+                snapshots, histories and filtering, and `training_data` is then a dict of horizon -> (X, Y).
+        """
         self.data_obj = data_obj
+        self.team_context = team_context or getattr(data_obj, 'team_context', None) or TeamContext()
         self.next_week_pred = next_week_pred
         self.features = features
         self.horizon = horizon
+        multiple_horizons = isinstance(horizon, (list, tuple, set, frozenset))
+        self.horizons = list(dict.fromkeys(horizon)) if multiple_horizons else [horizon]
         self.required_features = ID_FEATURES
-        self.training_data  = self.get_training_data()    
+        self.history_store = None
+        self.feature_store = FeatureStore(features, season=get_season_start_year(data_obj.events)) if use_feature_store else None
+        self.training_data_by_horizon = self.get_training_data()
+        self.training_data = self.training_data_by_horizon if multiple_horizons else self.training_data_by_horizon[horizon]
+
+    def get_last_gw(self, gw, horizon=None):
+        horizon = self.horizons[0] if horizon is None else horizon
+        rolling_horizon = get_dynamic_horizon(gw, 38, max_horizon=self.data_obj.range_weeks) if horizon == 'dynamic' else horizon
+        return min(gw + rolling_horizon, self.data_obj.end_gw)
+
+    def get_stored_data(self, gw, get_data):
+        """
+        Returns the training data for a gameweek and every horizon from the feature store, computing the missing
+        horizons in one pass and storing them. Partitions whose target window includes unfinished gameweeks are
+        computed but not stored, since their future points are not final yet.
+        """
+        data, missing = {}, []
+        for horizon in self.horizons:
+            gws_ahead = self.get_last_gw(gw, horizon) - gw
+            if gws_ahead > 0 and self.feature_store.has(gw, gws_ahead):
+                logging.info(f"Loading gameweek {gw} horizon {gws_ahead} from feature store")
+                data[horizon] = self.feature_store.read(gw, gws_ahead)
+            else:
+                missing.append(horizon)
+        for horizon, (X,Y) in get_data(gw, missing).items():
+            gws_ahead = self.get_last_gw(gw, horizon) - gw
+            if gw + gws_ahead < self.data_obj.current_gameweek and not self.feature_store.has(gw, gws_ahead):
+                self.feature_store.write(gw, gws_ahead, X, Y)
+            data[horizon] = X,Y
+        return data
+
+    def filter_irrelevant(self, snapshot, gw):
+        """
+        Drops players owned by fewer than 0.5% of managers or with under 20 minutes, logging any of the team's own players dropped.
+        """
+        current_team_ids = self.team_context.player_ids(gw)
+        logging.info(f"Filtering out irrelevant data...length: {len(snapshot)}")
+        
+        not_owned = snapshot["selected_by_percent"].astype(float) < 0.5
+        dropped_ids = set(snapshot.index[not_owned]).intersection(current_team_ids)
+        logging.warn(f"Dropped IDs in Current Team that are not owned by at least 0.5: {dropped_ids}")
+        
+        not_playing = snapshot["minutes"] < 20
+        dropped_ids = set(snapshot.index[not_playing]).intersection(current_team_ids)
+        logging.warn(f"Dropped IDs in Current Team that are not playing: {dropped_ids}")
+        
+        snapshot = snapshot[~(not_owned | not_playing)]
+        logging.info(f"Down to...length: {len(snapshot)}")
+        return snapshot
      
     @logger
     def get_training_data( self,):
-        def get_data(gw,snapshot=None,snapshot_dict=None):
-            rolling_horizon = get_dynamic_horizon(gw, 38, max_horizon=self.data_obj.range_weeks) if self.horizon == 'dynamic' else self.horizon
-            last_gw = min(gw + rolling_horizon, self.data_obj.end_gw)
-            if last_gw <= gw:  # Redundant safety check
-                return None,None
+        def get_data(gw,horizons,snapshot=None,snapshot_dict=None):
+            # Horizons that resolve to the same last gameweek share one feature computation
+            last_gws = {horizon: self.get_last_gw(gw, horizon) for horizon in horizons}
+            last_gws = {horizon: last_gw for horizon, last_gw in last_gws.items() if last_gw > gw}
+            if not last_gws:
+                return {}
             if snapshot is None:
+                if gw not in self.data_obj.range_historic_player_stats_snap:
+                    logging.warning(f"No snapshot loaded for gameweek {gw}, skipping it")
+                    return {}
                 snapshot_dict = self.data_obj.range_historic_player_stats_snap[gw]
-                snapshot,_,_ = get_player_data(snap=snapshot_dict,gw=gw)
-                snapshot.loc[:,["gw","last_gw"]] = [gw, last_gw]
-                snapshot = add_extra_features(snapshot,snapshot_dict,features=self.features)
-            else:
-                snapshot.loc[:,["gw","last_gw"]] = [gw, last_gw]
-                snapshot = add_extra_features(snapshot,snapshot_dict,features=self.features)
-                if gw == self.data_obj.end_gw-1:
-                    next_fixture_update = snapshot.copy()
-                    next_fixture_update.loc[:,["gw","last_gw"]] = last_gw, last_gw+1
-                    next_fixture_update = add_extra_features(next_fixture_update,snapshot_dict,features=self.features)
-                    snapshot[POSSIBLE_FUTURE_FEATURES] = next_fixture_update[POSSIBLE_FUTURE_FEATURES]
+                snapshot,_,_ = get_player_data(snap=snapshot_dict,gw=gw,fields=self.features,team_context=self.team_context)
             
             #filtering out irrelevant data that would skew model
             if not self.next_week_pred:
-                update_current_team_ids(gw)
-                logging.info(f"Filtering out irrelevant data...length: {len(snapshot)}")
-                
-                not_owned = snapshot[snapshot["selected_by_percent"].astype(float) < 0.5]
-                # Get the index values (IDs) from the snapshot where the "selected_by_percent" is less than 0.5
-                not_owned_index = set(not_owned.index)  # Convert to a set for faster lookup
-                # Now find the intersection between not_owned_index and CURRENT_TEAM_IDS
-                dropped_ids = not_owned_index.intersection(CURRENT_TEAM_IDS)
-                logging.warn(f"Dropped IDs in Current Team that are not owned by at least 0.5: {dropped_ids}")
-                
-                not_playing = snapshot[snapshot["minutes"] < 20]
-                not_playing_index = set(not_playing.index)  # Convert to a set for faster lookup
-                dropped_ids = not_playing_index.intersection(CURRENT_TEAM_IDS)
-                logging.warn(f"Dropped IDs in Current Team that are not playing: {dropped_ids}")
-                
-                snapshot = pandas.concat([snapshot,not_owned,not_playing]).drop_duplicates(keep=False)
-                logging.info(f"Down to...length: {len(snapshot)}")
+                snapshot = self.filter_irrelevant(snapshot, gw)
+            self.history_store = get_player_history_store(snapshot.index,self.history_store)
 
-            snapshot.dropna(subset=["future_points"], inplace=True)
-            
-            return snapshot[self.features], snapshot["future_points"]
+            # One evaluator per snapshot, so features that do not depend on the window are computed once for every horizon
+            evaluator = FeatureEvaluator(snapshot,snapshot_dict,history_store=self.history_store)
+            data = {}
+            for last_gw in sorted(set(last_gws.values())):
+                horizon_snapshot = snapshot.copy()
+                horizon_snapshot.loc[:,["gw","last_gw"]] = [gw, last_gw]
+                computed = evaluator.evaluate(list(self.features)+["future_points"],gw,last_gw)
+                horizon_snapshot[computed.columns] = computed
+                if self.next_week_pred and gw == self.data_obj.end_gw-1:
+                    next_fixture_update = evaluator.evaluate(POSSIBLE_FUTURE_FEATURES,last_gw,last_gw+1)
+                    horizon_snapshot[next_fixture_update.columns] = next_fixture_update
+                horizon_snapshot.dropna(subset=["future_points"], inplace=True)
+                data[last_gw] = with_object_categoricals(horizon_snapshot[self.features]), horizon_snapshot["future_points"]
+            return {horizon: data[last_gw] for horizon, last_gw in last_gws.items()}
 
-        X_all, Y_all = [], []
+        X_all = {horizon: [] for horizon in self.horizons}
+        Y_all = {horizon: [] for horizon in self.horizons}
         for gw in range(self.data_obj.start_gw, self.data_obj.end_gw):
             if self.next_week_pred:
-                X,Y = get_data(gw,self.data_obj.players,self.data_obj.raw_season_stats_snap)
+                data = get_data(gw,self.horizons,self.data_obj.players,self.data_obj.raw_season_stats_snap)
+            elif self.feature_store is not None:
+                data = self.get_stored_data(gw,get_data)
             else:
-                X,Y = get_data(gw)
-            if X is not None: 
-                X_all.append(X)
-                Y_all.append(Y)
-                
+                data = get_data(gw,self.horizons)
+            for horizon, (X,Y) in data.items():
+                X_all[horizon].append(X)
+                Y_all[horizon].append(Y)
 
-        return pandas.concat(X_all, ignore_index=True), pandas.concat(Y_all, ignore_index=True)
+        return {horizon: (pandas.concat(X_all[horizon], ignore_index=True), pandas.concat(Y_all[horizon], ignore_index=True))
+                for horizon in self.horizons}
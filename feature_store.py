@@ -0,0 +1,131 @@
+from constants import FEATURE_STORE_DIR, FEATURE_SCHEMA_VERSION
+import hashlib
+import logging
+import shutil
+import pandas
+import numpy
+import json
+import os
+
+TARGET_COLUMN = "future_points"
+
+
+def get_feature_schema_hash(features, season=None):
+    """
+    Returns a short hash identifying a feature set, so partitions computed for one feature list, season or
+    version of the feature code are never read back for another.
+    """
+    schema = {"version": FEATURE_SCHEMA_VERSION, "features": list(features), "season": season}
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def to_storable_array(series):
+    """
+    Converts a column to a fixed-width NumPy array that can be saved and memory-mapped: numbers stay numeric,
+    anything else becomes a fixed-width unicode array.
+    """
+    if isinstance(series.dtype, pandas.CategoricalDtype):
+        return series.astype(str).to_numpy(dtype=str)
+    if series.dtype == object:
+        try:
+            return pandas.to_numeric(series).to_numpy()
+        except (ValueError, TypeError):
+            return series.astype(str).to_numpy(dtype=str)
+    return series.to_numpy()
+
+
+class FeatureStore():
+    """
+    On-disk store of training data partitions, one per (feature schema, gameweek, horizon).
+
+    Each partition is a directory of `.npy` files, one per column plus the player IDs and the `future_points`
+    target, and a `meta.json` written last that marks the partition as complete. Columns are read back with
+    `numpy.load(mmap_mode='r')` so only the pages that are used get loaded.
+
+    Layout: `{root}/{schema_hash}/gw={gw}/horizon={horizon}/`
+    """
+
+    def __init__(self, features, season=None, root=FEATURE_STORE_DIR):
+        self.features = list(features)
+        self.season = season
+        self.base_root = root
+        self.schema_hash = get_feature_schema_hash(self.features, season)
+        self.root = os.path.join(root, self.schema_hash)
+
+    def partition_path(self, gw, horizon):
+        return os.path.join(self.root, f"gw={gw}", f"horizon={horizon}")
+
+    def has(self, gw, horizon):
+        return os.path.exists(os.path.join(self.partition_path(gw, horizon), "meta.json"))
+
+    def partitions(self):
+        """
+        Returns the sorted list of (gw, horizon) pairs that have a complete partition.
+        """
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        # Directories with a '.' are leftovers of interrupted writes
+        for gw_dir in (name for name in os.listdir(self.root) if name.startswith("gw=") and "." not in name):
+            for horizon_dir in (name for name in os.listdir(os.path.join(self.root, gw_dir)) if name.startswith("horizon=") and "." not in name):
+                gw, horizon = int(gw_dir.split("=")[1]), int(horizon_dir.split("=")[1])
+                if self.has(gw, horizon):
+                    found.append((gw, horizon))
+        return sorted(found)
+
+    def write(self, gw, horizon, X, Y):
+        """
+        Saves one partition, replacing any existing one.
+
+        Args:
+            gw (int): The gameweek the snapshot was taken at.
+            horizon (int): Number of gameweeks after `gw` that the target covers.
+            X (pandas.DataFrame): The features, indexed by player ID, with columns in `self.features` order.
+            Y (pandas.Series): The `future_points` target aligned with `X`.
+        """
+        path = self.partition_path(gw, horizon)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        # Columns are saved by position because a feature list can name the same column twice.
+        for position in range(X.shape[1]):
+            numpy.save(os.path.join(tmp_path, f"col_{position}.npy"), to_storable_array(X.iloc[:, position]))
+        numpy.save(os.path.join(tmp_path, "index.npy"), X.index.to_numpy(dtype=numpy.int64))
+        numpy.save(os.path.join(tmp_path, f"{TARGET_COLUMN}.npy"), to_storable_array(Y))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"columns": list(X.columns), "rows": len(X), "gw": gw, "horizon": horizon}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        logging.info(f"Wrote feature partition gw={gw} horizon={horizon} with {len(X)} rows to {path}")
+
+    def read_arrays(self, gw, horizon, columns=None):
+        """
+        Returns one partition as memory-mapped arrays without building a DataFrame.
+
+        Args:
+            gw (int): The gameweek the snapshot was taken at.
+            horizon (int): Number of gameweeks after `gw` that the target covers.
+            columns (list): Names of the columns to map. Defaults to all of them.
+
+        Returns:
+            tuple: A list of (column name, memory-mapped array) pairs in stored order, the player ID array and the target array.
+        """
+        path = self.partition_path(gw, horizon)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        wanted = meta["columns"] if columns is None else columns
+        arrays = [(name, numpy.load(os.path.join(path, f"col_{position}.npy"), mmap_mode="r"))
+                  for position, name in enumerate(meta["columns"]) if name in wanted]
+        index = numpy.load(os.path.join(path, "index.npy"), mmap_mode="r")
+        target = numpy.load(os.path.join(path, f"{TARGET_COLUMN}.npy"), mmap_mode="r")
+        return arrays, index, target
+
+    def read(self, gw, horizon, columns=None):
+        """
+        Returns one partition as features and target, indexed by player ID as they were written.
+        """
+        arrays, index, target = self.read_arrays(gw, horizon, columns)
+        X = pandas.DataFrame(dict(enumerate(array for _, array in arrays)), index=pandas.Index(index, name="id"))
+        X.columns = [name for name, _ in arrays]
+        Y = pandas.Series(target, index=X.index, name=TARGET_COLUMN)
+        return X, Y
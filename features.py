@@ -0,0 +1,228 @@
+from constants import INJURED_FLAGS
+from utils import get_fixture_index, get_player_history_store
+from snapshot_archive import ArchivedSnapshot
+from dataclasses import dataclass
+from metrics import METRICS
+import pandas
+import numpy
+
+TEAM_STRENGTH_FEATURES = [f"strength_{kind}_{venue}" for kind in ('overall', 'attack', 'defence') for venue in ('home', 'away')]
+# Inputs supplied by the evaluator rather than read from the snapshot or computed by a registered feature.
+CONTEXT_INPUTS = ('gw', 'last_gw', 'id', 'snapshot_dict', 'history_store')
+# Context inputs that change with the prediction window, making every feature that depends on them per (gw, horizon).
+WINDOW_INPUTS = ('gw', 'last_gw')
+
+
+@dataclass(frozen=True)
+class Feature():
+    """
+    A derived feature: the names of its inputs (snapshot columns, context inputs or other registered features)
+    and a vectorized function computing it from them, in order, for every row at once.
+    """
+    name: str
+    inputs: tuple
+    compute: object
+
+
+class FeatureRegistry():
+    """
+    The derived features the pipeline can compute, as a dependency graph. Names starting with an underscore are
+    intermediate results shared by several features and never returned as columns.
+    """
+
+    def __init__(self):
+        self.features = {}
+
+    def register(self, name, inputs=()):
+        """
+        Decorator registering a function as the implementation of a feature.
+        """
+        def decorator(compute):
+            self.features[name] = Feature(name, tuple(inputs), compute)
+            return compute
+        return decorator
+
+    def __contains__(self, name):
+        return name in self.features
+
+    def get_closure(self, names):
+        """
+        Returns the registered features needed to compute `names`, each after its dependencies.
+        """
+        ordered, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done or name not in self.features:
+                return
+            if name in visiting:
+                raise ValueError(f"Feature {name} depends on itself")
+            visiting.add(name)
+            for dependency in self.features[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(self.features[name])
+
+        for name in names:
+            visit(name)
+        return ordered
+
+    def depends_on(self, name, dependencies):
+        """
+        Returns True if a feature has any of `dependencies` among its inputs, directly or through other features.
+        """
+        return any(dependency in dependencies for feature in self.get_closure([name]) for dependency in feature.inputs)
+
+    def uses_window(self, name):
+        """
+        Returns True if a feature depends, directly or through other features, on the prediction window.
+        """
+        return self.depends_on(name, WINDOW_INPUTS)
+
+
+FEATURE_REGISTRY = FeatureRegistry()
+
+
+@FEATURE_REGISTRY.register('_teams', inputs=('snapshot_dict',))
+def get_teams_frame(snapshot_dict):
+    if isinstance(snapshot_dict, ArchivedSnapshot):
+        teams = snapshot_dict.teams_frame(['id'] + TEAM_STRENGTH_FEATURES)
+    else:
+        teams = pandas.DataFrame(snapshot_dict["teams"])
+    return teams.set_index('id')
+
+
+def register_team_strength(strength):
+    @FEATURE_REGISTRY.register(strength, inputs=('team', '_teams'))
+    def get_team_strength(team, teams):
+        return teams[strength].reindex(team.to_numpy()).to_numpy()
+
+
+for strength in TEAM_STRENGTH_FEATURES:
+    register_team_strength(strength)
+
+
+@FEATURE_REGISTRY.register('is_injured', inputs=('status',))
+def get_is_injured(status):
+    return status.isin(INJURED_FLAGS).astype(int).to_numpy()
+
+
+@FEATURE_REGISTRY.register('_fixture_window', inputs=('team', 'gw', 'last_gw'))
+def get_fixture_window(team, gw, last_gw):
+    return get_fixture_index().window(team.astype(int).to_numpy(), gw + 1, last_gw)
+
+
+@FEATURE_REGISTRY.register('num_fixtures', inputs=('_fixture_window',))
+def get_num_fixtures(fixture_window):
+    return fixture_window[0]
+
+
+@FEATURE_REGISTRY.register('total_fdr', inputs=('_fixture_window',))
+def get_total_fdr(fixture_window):
+    return fixture_window[1]
+
+
+@FEATURE_REGISTRY.register('_player_window', inputs=('id', 'gw', 'last_gw', 'history_store'))
+def get_player_window(player_ids, gw, last_gw, history_store):
+    return history_store.window(player_ids, gw + 1, last_gw)
+
+
+@FEATURE_REGISTRY.register('future_points', inputs=('_player_window',))
+def get_future_points(player_window):
+    # Players whose history could not be loaded get NaN and are dropped downstream
+    return player_window[0]
+
+
+@FEATURE_REGISTRY.register('minutes_played_horizon', inputs=('_player_window',))
+def get_minutes_played_horizon(player_window):
+    return player_window[1]
+
+
+@FEATURE_REGISTRY.register('points_per_90', inputs=('future_points', 'minutes_played_horizon'))
+def get_points_per_90(future_points, minutes):
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return numpy.where(minutes > 0, future_points / minutes * 90, 1)  # Avoid div by zero
+
+
+@FEATURE_REGISTRY.register('adjusted_points_per_90', inputs=('points_per_90', 'total_fdr'))
+def get_adjusted_points_per_90(points_per_90, total_fdr):
+    #normalize with a simple linear adjustment
+    return points_per_90 * numpy.where(total_fdr > 0, 1 / (1 + total_fdr), 1)
+
+
+class FeatureEvaluator():
+    """
+    Computes registered features for one snapshot lazily: only the dependency closure of the requested features
+    is evaluated, and every result is memoized, per (gw, last_gw) for features that depend on the prediction
+    window and once for the rest, so several horizons over the same snapshot share everything they can.
+    """
+
+    def __init__(self, snapshot, snapshot_dict, history_store=None, registry=FEATURE_REGISTRY):
+        """
+        Args:
+            snapshot (pandas.DataFrame): The player rows, indexed by ID, e.g. from `get_player_data`.
+            snapshot_dict (dict or ArchivedSnapshot): The raw snapshot, for its teams.
+            history_store (PlayerHistoryStore): Histories to extend rather than reload, if any.
+        """
+        self.snapshot = snapshot
+        self.snapshot_dict = snapshot_dict
+        self.history_store = history_store
+        self.registry = registry
+        self._memo = {}
+
+    def get_context(self, name, gw, last_gw):
+        if name == 'gw':
+            return self.snapshot['gw'].astype(int).to_numpy() if gw is None else gw
+        if name == 'last_gw':
+            return self.snapshot['last_gw'].astype(int).to_numpy() if last_gw is None else last_gw
+        if name == 'id':
+            return self.snapshot.index.to_numpy()
+        if name == 'snapshot_dict':
+            return self.snapshot_dict
+        self.history_store = get_player_history_store(self.snapshot.index, self.history_store)
+        return self.history_store
+
+    def get(self, name, gw=None, last_gw=None):
+        """
+        Returns one input for every row: a registered feature, a context input or a snapshot column.
+        """
+        if name in self.registry:
+            # Window values taken from the snapshot's own columns are not memoized, since the columns may change
+            window = (gw, last_gw) if self.registry.uses_window(name) else None
+            key = (name, window)
+            if key not in self._memo or (window is not None and None in window):
+                feature = self.registry.features[name]
+                self._memo[key] = feature.compute(*(self.get(dependency, gw, last_gw) for dependency in feature.inputs))
+            return self._memo[key]
+        if name in CONTEXT_INPUTS:
+            return self.get_context(name, gw, last_gw)
+        return self.snapshot[name]
+
+    def evaluate(self, names, gw=None, last_gw=None):
+        """
+        Returns the registered features among `names` as a frame aligned with the snapshot.
+
+        Args:
+            names (iterable): The features wanted. Names that are not registered, e.g. raw snapshot columns, are skipped.
+            gw (int): The gameweek of the snapshot. Defaults to each row's 'gw' column.
+            last_gw (int): The last gameweek of the prediction window. Defaults to each row's 'last_gw' column.
+
+        Returns:
+            pandas.DataFrame: One column per registered feature requested, in request order.
+        """
+        names = [name for name in dict.fromkeys(names) if name in self.registry and not name.startswith('_')]
+        METRICS.increment("rows_processed", len(self.snapshot))
+        return pandas.DataFrame({name: self.get(name, gw, last_gw) for name in names}, index=self.snapshot.index)
+
+
+def add_extra_features(snapshot,snapshot_dict,features,history_store=None):
+    """
+    Adds the registered features among `features`, and always 'future_points', to a snapshot with 'gw' and
+    'last_gw' columns, computing only what they depend on.
+
+    Returns:
+        pandas.DataFrame: The snapshot with the new columns.
+    """
+    computed = FeatureEvaluator(snapshot, snapshot_dict, history_store).evaluate(list(features) + ["future_points"])
+    snapshot[computed.columns] = computed
+    return snapshot
@@ -0,0 +1,107 @@
+from constants import FETCH_MAX_WORKERS, FETCH_REQUESTS_PER_SECOND, FETCH_RETRIES, FETCH_BACKOFF, FETCH_BATCH_SIZE
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import requests
+import logging
+import random
+import time
+
+
+class RateLimiter():
+    """
+    Thread-safe limiter that spaces out request starts so no more than `requests_per_second` begin each second.
+    A rate of None or 0 disables limiting.
+    """
+
+    def __init__(self, requests_per_second=FETCH_REQUESTS_PER_SECOND):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def is_transient(error):
+    """
+    Returns True for failures worth retrying: connection errors, timeouts, rate limiting and 5xx responses.
+    Other HTTP errors, e.g. a 404 for an entry that does not exist, will fail the same way every time.
+    """
+    if isinstance(error, requests.HTTPError):
+        status_code = error.response.status_code if error.response is not None else None
+        return status_code is None or status_code == 429 or status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def fetch_with_retry(fetch, url, rate_limiter=None, retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+    """
+    Calls `fetch(url)`, retrying transient failures (see `is_transient`) with jittered exponential backoff.
+
+    Args:
+        fetch (callable): Function taking a URL and returning the decoded response, e.g. `utils.query_API`.
+        url (str): The URL to fetch.
+        rate_limiter (RateLimiter): Optional limiter waited on before every attempt.
+        retries (int): Number of retries after the first attempt.
+        backoff (float): Delay in seconds before the first retry, doubled for each one after.
+
+    Returns:
+        The result of `fetch(url)`.
+
+    Raises:
+        The first non-transient exception raised by `fetch`, or the last one once the retries are used up.
+    """
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        try:
+            return fetch(url)
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random())
+            logging.warning(f"Attempt {attempt + 1} failed for URL: {url} ({e}), retrying in {delay:.2f} seconds")
+            time.sleep(delay)
+
+
+def fetch_many(urls, fetch, max_workers=FETCH_MAX_WORKERS, requests_per_second=FETCH_REQUESTS_PER_SECOND,
+               retries=FETCH_RETRIES, backoff=FETCH_BACKOFF, batch_size=FETCH_BATCH_SIZE):
+    """
+    Fetches many URLs concurrently on a thread pool, in batches, logging the throughput of each batch.
+
+    Args:
+        urls (iterable): The URLs to fetch. Duplicates are fetched once.
+        fetch (callable): Function taking a URL and returning the decoded response, e.g. `utils.query_API`.
+        max_workers (int): Maximum number of requests in flight at once.
+        requests_per_second (float): Polite upper bound on request starts per second, None for no limit.
+        retries (int): Number of retries per URL after the first attempt.
+        backoff (float): Delay in seconds before the first retry, doubled for each one after.
+        batch_size (int): Number of URLs per batch.
+
+    Returns:
+        tuple: A dictionary mapping each fetched URL to its response and a dictionary mapping each URL
+        that still failed after all retries to its exception.
+    """
+    urls = list(dict.fromkeys(urls))
+    results, errors = {}, {}
+    rate_limiter = RateLimiter(requests_per_second)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch_start in range(0, len(urls), batch_size):
+            batch = urls[batch_start:batch_start + batch_size]
+            start_time = time.time()
+            futures = {url: executor.submit(fetch_with_retry, fetch, url, rate_limiter, retries, backoff) for url in batch}
+            for url, future in futures.items():
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    errors[url] = e
+            elapsed = time.time() - start_time
+            logging.info(f"Fetched batch {batch_start // batch_size + 1}: {len(batch)} URLs in {elapsed:.2f} seconds "
+                         f"({len(batch) / elapsed if elapsed else float('inf'):.1f} URLs/s, {len(errors)} failed so far)")
+    return results, errors
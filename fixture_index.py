@@ -0,0 +1,59 @@
+import numpy
+
+
+class FixtureIndex():
+    """
+    Dense team × gameweek view of the fixture list, built once so fixture counts and difficulty over any
+    gameweek window can be looked up for a whole snapshot at once.
+
+    `counts[team, gw]` is the number of fixtures a team plays in a gameweek (0 for a blank, 2+ for a double) and
+    `fdr[team, gw]` the summed difficulty of those fixtures. Both have cumulative sums along the gameweek axis
+    so the total over [start_gw, end_gw] is a difference of two lookups.
+    """
+
+    def __init__(self, fixtures):
+        scheduled = [fixture for fixture in fixtures if fixture.get("event") is not None]
+        events = numpy.array([fixture["event"] for fixture in scheduled], dtype=numpy.int64)
+        home = numpy.array([fixture["team_h"] for fixture in scheduled], dtype=numpy.int64)
+        away = numpy.array([fixture["team_a"] for fixture in scheduled], dtype=numpy.int64)
+        home_fdr = numpy.array([fixture["team_h_difficulty"] for fixture in scheduled], dtype=numpy.int64)
+        away_fdr = numpy.array([fixture["team_a_difficulty"] for fixture in scheduled], dtype=numpy.int64)
+
+        self.num_teams = int(max(home.max(initial=0), away.max(initial=0)))
+        self.num_gws = int(events.max(initial=0))
+        shape = (self.num_teams + 1, self.num_gws + 1)
+        self.counts = numpy.zeros(shape, dtype=numpy.int64)
+        self.fdr = numpy.zeros(shape, dtype=numpy.int64)
+        # add.at accumulates repeated (team, gw) pairs, which is what makes double gameweeks count twice.
+        numpy.add.at(self.counts, (home, events), 1)
+        numpy.add.at(self.counts, (away, events), 1)
+        numpy.add.at(self.fdr, (home, events), home_fdr)
+        numpy.add.at(self.fdr, (away, events), away_fdr)
+
+        # Leading zero column so that cum[:, g + 1] is the total over gameweeks 0..g.
+        self.cum_counts = numpy.pad(self.counts.cumsum(axis=1), ((0, 0), (1, 0)))
+        self.cum_fdr = numpy.pad(self.fdr.cumsum(axis=1), ((0, 0), (1, 0)))
+
+    def window(self, team_ids, start_gw, end_gw):
+        """
+        Returns the number of fixtures and total fixture difficulty for each team over gameweeks [start_gw, end_gw].
+
+        Args:
+            team_ids (array-like): Team IDs, one per row to look up.
+            start_gw (int or array-like): First gameweek of the window, inclusive. Either one value for every row or one per row.
+            end_gw (int or array-like): Last gameweek of the window, inclusive. Either one value for every row or one per row.
+
+        Returns:
+            tuple: Two integer arrays aligned with `team_ids`, the number of fixtures and the total fixture difficulty.
+            Unknown teams and empty windows give 0.
+        """
+        team_ids = numpy.asarray(team_ids, dtype=numpy.int64)
+        start = numpy.clip(numpy.broadcast_to(numpy.asarray(start_gw, dtype=numpy.int64), team_ids.shape), 0, self.num_gws + 1)
+        end = numpy.clip(numpy.broadcast_to(numpy.asarray(end_gw, dtype=numpy.int64), team_ids.shape) + 1, 0, self.num_gws + 1)
+        end = numpy.maximum(end, start)
+        known = (team_ids >= 0) & (team_ids <= self.num_teams)
+        teams = numpy.where(known, team_ids, 0)
+
+        num_fixtures = numpy.where(known, self.cum_counts[teams, end] - self.cum_counts[teams, start], 0)
+        total_fdr = numpy.where(known, self.cum_fdr[teams, end] - self.cum_fdr[teams, start], 0)
+        return num_fixtures, total_fdr
@@ -0,0 +1,84 @@
+import numpy
+
+
+class PlayerHistoryStore():
+    """
+    Columnar view of many players' element-summary `history`: player × round arrays of points, minutes and
+    appearances, with prefix sums of points and minutes along the round axis.
+
+    Sums over any round window [start_round, end_round] are answered for every player at once as the
+    difference of two prefix-sum lookups, instead of re-filtering each player's list of dicts.
+    """
+
+    def __init__(self, summaries):
+        """
+        Args:
+            summaries (dict): Player IDs mapped to their JSON-decoded element-summary payload.
+        """
+        self.player_ids = numpy.array(sorted(summaries), dtype=numpy.int64)
+        rows, rounds, points, minutes = [], [], [], []
+        for row, player_id in enumerate(self.player_ids):
+            summary = summaries[player_id]
+            for gw in summary.get("history", []):
+                rows.append(row)
+                rounds.append(gw["round"])
+                points.append(gw.get("total_points") or 0)
+                minutes.append(gw.get("minutes") or 0)
+
+        rows, rounds = numpy.array(rows, dtype=numpy.int64), numpy.array(rounds, dtype=numpy.int64)
+        self.num_rounds = int(rounds.max(initial=0))
+        shape = (len(self.player_ids), self.num_rounds + 1)
+
+        # Rounds can repeat for a player in a double gameweek, so accumulate rather than assign.
+        self.points = numpy.zeros(shape, dtype=numpy.int64)
+        self.minutes = numpy.zeros(shape, dtype=numpy.int64)
+        self.played = numpy.zeros(shape, dtype=numpy.int64)
+        numpy.add.at(self.points, (rows, rounds), numpy.array(points, dtype=numpy.int64))
+        numpy.add.at(self.minutes, (rows, rounds), numpy.array(minutes, dtype=numpy.int64))
+        numpy.add.at(self.played, (rows, rounds), 1)
+
+        # Leading zero column so that cum[:, r + 1] is the total over rounds 0..r.
+        self.cum_points = numpy.pad(self.points.cumsum(axis=1), ((0, 0), (1, 0)))
+        self.cum_minutes = numpy.pad(self.minutes.cumsum(axis=1), ((0, 0), (1, 0)))
+
+    def __len__(self):
+        return len(self.player_ids)
+
+    def rows_for(self, player_ids):
+        """
+        Returns the store row for each player ID and a mask of which IDs are in the store.
+        """
+        player_ids = numpy.asarray(player_ids, dtype=numpy.int64)
+        rows = numpy.clip(numpy.searchsorted(self.player_ids, player_ids), 0, max(len(self.player_ids) - 1, 0))
+        known = (self.player_ids[rows] == player_ids) if len(self.player_ids) else numpy.zeros(player_ids.shape, dtype=bool)
+        return rows, known
+
+    def covers(self, player_ids):
+        return bool(self.rows_for(player_ids)[1].all())
+
+    def _window_bounds(self, player_ids, start_round, end_round):
+        rows, known = self.rows_for(player_ids)
+        start = numpy.clip(numpy.broadcast_to(numpy.asarray(start_round, dtype=numpy.int64), rows.shape), 0, self.num_rounds + 1)
+        end = numpy.clip(numpy.broadcast_to(numpy.asarray(end_round, dtype=numpy.int64), rows.shape) + 1, 0, self.num_rounds + 1)
+        return rows, known, start, numpy.maximum(end, start)
+
+    def window(self, player_ids, start_round, end_round):
+        """
+        Returns each player's total points and minutes over rounds [start_round, end_round].
+
+        Args:
+            player_ids (array-like): The player IDs to look up.
+            start_round (int or array-like): First round of the window, inclusive. Either one value for every player or one per player.
+            end_round (int or array-like): Last round of the window, inclusive. Either one value for every player or one per player.
+
+        Returns:
+            tuple: Two float arrays aligned with `player_ids`, total points and total minutes. Players
+            missing from the store give NaN.
+        """
+        if not len(self):
+            missing = numpy.full(numpy.shape(player_ids), numpy.nan)
+            return missing, missing.copy()
+        rows, known, start, end = self._window_bounds(player_ids, start_round, end_round)
+        points = numpy.where(known, self.cum_points[rows, end] - self.cum_points[rows, start], numpy.nan)
+        minutes = numpy.where(known, self.cum_minutes[rows, end] - self.cum_minutes[rows, start], numpy.nan)
+        return points, minutes
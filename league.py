@@ -0,0 +1,140 @@
+from constants import FETCH_MAX_WORKERS, PICKS_REQUESTS_PER_SECOND, DIFFERENTIAL_OWNERSHIP
+from utils import query_API, get_picks_url, prefetch, logger
+import logging
+import pandas
+import numpy
+
+
+def get_league_standings_url(league_id, page):
+    return f"https://fantasy.premierleague.com/api/leagues-classic/{league_id}/standings/?page_standings={page}"
+
+
+def get_league_entry_ids(league_id, max_pages=None):
+    """
+    Returns the entry IDs of a classic mini-league, walking every page of its standings.
+
+    Args:
+        league_id (int): The ID of the classic league.
+        max_pages (int): Stop after this many pages (50 entries each). Defaults to all of them.
+
+    Returns:
+        list: The entry IDs in standings order.
+    """
+    entry_ids, page = [], 1
+    while max_pages is None or page <= max_pages:
+        standings = query_API(get_league_standings_url(league_id, page))['standings']
+        entry_ids += [result['entry'] for result in standings['results']]
+        if not standings['has_next']:
+            break
+        page += 1
+    return entry_ids
+
+
+@logger
+def get_league_picks(entry_ids, gw, max_workers=FETCH_MAX_WORKERS, requests_per_second=PICKS_REQUESTS_PER_SECOND):
+    """
+    Fetches the picks of many entries for a gameweek concurrently through the shared response cache.
+
+    Args:
+        entry_ids (iterable): The entries to fetch.
+        gw (int): The gameweek to get the picks for.
+        max_workers (int): Maximum number of requests in flight at once.
+        requests_per_second (float): Polite upper bound on request starts per second.
+
+    Returns:
+        dict: A dictionary mapping entry IDs to their list of picks, for the entries that could be fetched.
+    """
+    urls = {get_picks_url(entry_id, gw): entry_id for entry_id in entry_ids}
+    errors = prefetch(urls, max_workers=max_workers, requests_per_second=requests_per_second)
+    for url, error in errors.items():
+        logging.warning(f"Failed to fetch picks for entry {urls[url]} in gameweek {gw}: {error}")
+    return {entry_id: query_API(url)['picks'] for url, entry_id in urls.items() if url not in errors}
+
+
+class LeagueAnalysis():
+    """
+    Projected points, effective ownership and differentials for a set of entries, from one shared prediction vector.
+
+    Picks are held as an entries x players multiplier matrix (2 for the captain, 1 for other starters, 0 on the
+    bench, as the API reports them), so every entry is scored in one matrix product.
+
+    Attributes:
+        entry_ids (list): The entries, in row order.
+        player_ids (numpy.ndarray): The players picked by at least one entry, in column order.
+        owned (numpy.ndarray): Whether each entry has each player in its squad.
+        multipliers (numpy.ndarray): Each entry's multiplier for each player.
+        points (numpy.ndarray): Predicted points per player, 0 for players without a prediction.
+    """
+
+    def __init__(self, picks, points):
+        """
+        Args:
+            picks (dict): Entry ID to its list of picks, e.g. from `get_league_picks`.
+            points (pandas.Series): Predicted points indexed by player ID, e.g. from `Predictor.predict`.
+        """
+        self.entry_ids = list(picks)
+        self.player_ids = numpy.unique(numpy.array([pick['element'] for entry_picks in picks.values() for pick in entry_picks], dtype=numpy.int64))
+        columns = {player_id: column for column, player_id in enumerate(self.player_ids.tolist())}
+        self.owned = numpy.zeros((len(self.entry_ids), len(self.player_ids)), dtype=bool)
+        self.multipliers = numpy.zeros(self.owned.shape, dtype=numpy.int8)
+        for row, entry_picks in enumerate(picks.values()):
+            cols = [columns[pick['element']] for pick in entry_picks]
+            self.owned[row, cols] = True
+            self.multipliers[row, cols] = [pick['multiplier'] for pick in entry_picks]
+        self.points = points.reindex(self.player_ids).fillna(0).to_numpy(dtype=float)
+
+    @classmethod
+    def fetch(cls, entry_ids, gw, points, max_workers=FETCH_MAX_WORKERS, requests_per_second=PICKS_REQUESTS_PER_SECOND):
+        return cls(get_league_picks(entry_ids, gw, max_workers, requests_per_second), points)
+
+    @classmethod
+    def fetch_league(cls, league_id, gw, points, max_pages=None, max_workers=FETCH_MAX_WORKERS,
+                     requests_per_second=PICKS_REQUESTS_PER_SECOND):
+        return cls.fetch(get_league_entry_ids(league_id, max_pages), gw, points, max_workers, requests_per_second)
+
+    def get_ownership_arrays(self):
+        """
+        Returns, per player column, the share of entries owning them and their effective ownership: the mean
+        multiplier across entries, so a player captained by everyone has an effective ownership of 2.
+        """
+        num_entries = max(len(self.entry_ids), 1)
+        return self.owned.sum(axis=0) / num_entries, self.multipliers.sum(axis=0, dtype=numpy.int64) / num_entries
+
+    def get_ownership(self):
+        """
+        Returns the ownership and effective ownership of every picked player, highest effective ownership first.
+        """
+        ownership, effective_ownership = self.get_ownership_arrays()
+        return pandas.DataFrame({
+            'ownership': ownership,
+            'effective_ownership': effective_ownership,
+            'predicted_points': self.points,
+        }, index=pandas.Index(self.player_ids, name='id')).sort_values('effective_ownership', ascending=False)
+
+    def get_projections(self):
+        """
+        Returns, per entry, the projected points of its XI (captain counted twice) and the projected points it
+        gains on the league from how its multipliers differ from the league's effective ownership.
+        """
+        _, effective_ownership = self.get_ownership_arrays()
+        multipliers = self.multipliers.astype(float)
+        return pandas.DataFrame({
+            'projected_points': multipliers @ self.points,
+            'projected_gain_on_league': (multipliers - effective_ownership) @ self.points,
+        }, index=pandas.Index(self.entry_ids, name='entry')).sort_values('projected_points', ascending=False)
+
+    def get_differentials(self, max_ownership=DIFFERENTIAL_OWNERSHIP):
+        """
+        Returns the starters each entry fields that at most `max_ownership` of the league owns, one row per
+        (entry, player), with the points they are projected to win the entry relative to the league.
+        """
+        ownership, effective_ownership = self.get_ownership_arrays()
+        rows, cols = numpy.nonzero((self.multipliers > 0) & (ownership <= max_ownership)[None, :])
+        return pandas.DataFrame({
+            'entry': numpy.asarray(self.entry_ids, dtype=numpy.int64)[rows],
+            'id': self.player_ids[cols],
+            'multiplier': self.multipliers[rows, cols],
+            'ownership': ownership[cols],
+            'predicted_points': self.points[cols],
+            'projected_swing': (self.multipliers[rows, cols] - effective_ownership[cols]) * self.points[cols],
+        }).sort_values(['entry', 'projected_swing'], ascending=[True, False], ignore_index=True)
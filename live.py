@@ -0,0 +1,171 @@
+from constants import (
+    RAW_PLAYER_STATS_URL,
+    SNAPSHOT_REQUIRED_FIELDS,
+    CURRENT_STATS_FEATURES,
+    POSSIBLE_FUTURE_FEATURES,
+    ID_FEATURES,
+    CREATED_AVG_FEATURES,
+    LIVE_POLL_INTERVAL,
+)
+from utils import poll_API, get_current_gameweek, get_player_history_store
+from features import add_extra_features
+from snapshot_loader import load_elements_frame, with_object_categoricals
+from metrics import METRICS
+import logging
+import pandas
+import time
+
+
+def get_event_live_url(gw):
+    return f"https://fantasy.premierleague.com/api/event/{gw}/live/"
+
+
+def get_changed_elements(previous, current, key=lambda element: element):
+    """
+    Returns the elements of `current` that are new or differ from the element with the same 'id' in `previous`.
+
+    Args:
+        previous (dict): Player ID to the value last seen for it.
+        current (list): The elements of the new payload.
+        key (callable): Picks the part of an element to compare and keep, e.g. its 'stats'.
+    """
+    return [element for element in current if previous.get(element['id']) != key(element)]
+
+
+class LiveGameweek():
+    """
+    Polls bootstrap-static and event/{gw}/live during a gameweek and keeps player features, live stats and
+    predictions up to date incrementally.
+
+    Every poll is a conditional request, so an unchanged payload costs a 304 and no work. A changed payload is
+    diffed element by element against the last one seen, and only the players that changed have their typed
+    row and derived features rebuilt and are re-scored by the predictor.
+
+    Attributes:
+        players (pandas.DataFrame): Features of every player, indexed by ID.
+        live (pandas.DataFrame): Each player's live stats for the gameweek, indexed by ID.
+        predictions (pandas.Series): Predicted future points per player, when a predictor is given.
+    """
+
+    def __init__(self, features=CURRENT_STATS_FEATURES+POSSIBLE_FUTURE_FEATURES+ID_FEATURES+CREATED_AVG_FEATURES, horizon=1, predictor=None, gw=None):
+        """
+        Args:
+            features (list): The features to keep per player, as for `DataProcessor`.
+            horizon (int): The number of gameweeks after `gw` the derived features look ahead.
+            predictor (Predictor): Scores the players whose features changed. Optional.
+            gw (int): The live gameweek. Defaults to the current one from bootstrap-static.
+        """
+        self.features = features
+        self.horizon = horizon
+        self.predictor = predictor
+        self.gw = gw
+        self.snapshot = None
+        self.history_store = None
+        self.elements = {}
+        self.live_stats = {}
+        self.players = None
+        self.live = pandas.DataFrame(index=pandas.Index([], name='id'))
+        self.predictions = pandas.Series(dtype=float, name='predicted_future_points')
+
+    def refresh(self):
+        """
+        Polls both endpoints once and applies whatever changed.
+
+        Returns:
+            dict: The IDs of the players whose features ('players') and live stats ('live') were updated.
+        """
+        updated = {'players': [], 'live': []}
+        snapshot, changed = poll_API(RAW_PLAYER_STATS_URL)
+        if changed or self.snapshot is None:
+            self.snapshot = snapshot
+            self.gw = self.gw or get_current_gameweek(snapshot['events'])
+            changed_elements = get_changed_elements(self.elements, snapshot['elements'], key=self.get_element_fields)
+            if changed_elements:
+                updated['players'] = self.update_players(changed_elements)
+
+        live, changed = poll_API(get_event_live_url(self.gw))
+        if changed or not self.live_stats:
+            changed_stats = get_changed_elements(self.live_stats, live['elements'], key=lambda element: element['stats'])
+            if changed_stats:
+                updated['live'] = self.update_live(changed_stats)
+        METRICS.increment('live_players_updated', len(updated['players']))
+        logging.info(f"Live gameweek {self.gw}: {len(updated['players'])} players and {len(updated['live'])} live stats updated")
+        return updated
+
+    def get_element_fields(self, element):
+        """
+        Returns the fields of an element that its typed row and features are built from, so a change anywhere
+        else in the element (e.g. its 'event_points' as matches are played) does not trigger a rebuild.
+        """
+        return {field: element.get(field) for field in SNAPSHOT_REQUIRED_FIELDS + list(self.features)}
+
+    def update_players(self, elements):
+        """
+        Rebuilds the typed rows and derived features of the given elements only, and re-scores them.
+
+        Returns:
+            list: The updated player IDs.
+        """
+        for element in elements:
+            self.elements[element['id']] = self.get_element_fields(element)
+        frame = load_elements_frame(elements, SNAPSHOT_REQUIRED_FIELDS + list(self.features))
+        frame.loc[:, ["gw", "last_gw"]] = [self.gw, self.gw + self.horizon]
+        self.history_store = get_player_history_store(frame.index, self.history_store)
+        frame = with_object_categoricals(add_extra_features(frame, self.snapshot, features=self.features, history_store=self.history_store))
+        self.players = frame if self.players is None else self.merge_rows(self.players, frame)
+        if self.predictor is not None:
+            self.predictions = self.merge_rows(self.predictions, self.predictor.predict(frame[self.features]))
+        return frame.index.tolist()
+
+    def update_live(self, elements):
+        for element in elements:
+            self.live_stats[element['id']] = element['stats']
+        frame = pandas.DataFrame([element['stats'] for element in elements],
+                                 index=pandas.Index([element['id'] for element in elements], name='id'))
+        self.live = self.merge_rows(self.live, frame)
+        return frame.index.tolist()
+
+    @staticmethod
+    def merge_rows(existing, updates):
+        """
+        Returns `existing` with the rows of `updates` replaced in place and any new rows appended.
+        """
+        present = updates.index.isin(existing.index)
+        if present.any():
+            existing.loc[updates.index[present]] = updates[present]
+        if not present.all():
+            existing = pandas.concat([existing, updates[~present]]) if len(existing) else updates[~present]
+        return existing
+
+    def projections(self):
+        """
+        Returns each player's identity, live stats and predicted future points side by side.
+        """
+        players = self.players[[column for column in ['web_name', 'element_type', 'team', 'now_cost'] if column in self.players.columns]]
+        projections = players.join(self.live, rsuffix='_live')
+        if len(self.predictions):
+            projections = projections.join(self.predictions)
+        return projections
+
+    def run(self, interval=LIVE_POLL_INTERVAL, iterations=None, on_update=None):
+        """
+        Polls every `interval` seconds, `iterations` times or until interrupted.
+
+        Args:
+            interval (float): Seconds between polls.
+            iterations (int): Number of polls. Defaults to polling forever.
+            on_update (callable): Called as `on_update(self, updated)` after a poll that changed anything.
+        """
+        count = 0
+        while iterations is None or count < iterations:
+            started = time.monotonic()
+            try:
+                updated = self.refresh()
+            except Exception as e:
+                logging.warning(f"Live poll failed: {e}")
+            else:
+                if on_update is not None and (updated['players'] or updated['live']):
+                    on_update(self, updated)
+            count += 1
+            if iterations is None or count < iterations:
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
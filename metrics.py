@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+import threading
+import time
+import json
+import os
+
+
+class MetricsRegistry():
+    """
+    In-process registry of pipeline metrics: wall and CPU time and call counts per stage, plus named counters
+    (cache hits and misses, bytes downloaded, rows processed, ...).
+
+    Recording is a single attribute check when the registry is disabled, so instrumented code can call it
+    unconditionally. Enable it with `enable()` or the FPL_METRICS=1 environment variable, and export with
+    `to_json()` or `to_prometheus()`.
+
+    CPU time is process CPU time (all threads), so stages that overlap with background fetch threads include
+    their work too.
+    """
+
+    def __init__(self, enabled=None):
+        self.enabled = os.environ.get('FPL_METRICS', '') not in ('', '0') if enabled is None else enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+
+    def record_stage(self, stage, wall_seconds, cpu_seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self.stages.setdefault(stage, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'max_wall_seconds': 0.0})
+            stats['calls'] += 1
+            stats['wall_seconds'] += wall_seconds
+            stats['cpu_seconds'] += cpu_seconds
+            stats['max_wall_seconds'] = max(stats['max_wall_seconds'], wall_seconds)
+
+    def increment(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timed(self, stage):
+        """Context manager recording the wall and CPU time of its body under `stage`."""
+        if not self.enabled:
+            yield
+            return
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def cache_hit_ratio(self):
+        """Returns the fraction of response cache lookups answered from memory or disk, or None before any lookup."""
+        hits = self.counters.get('cache_memory_hits', 0) + self.counters.get('cache_disk_hits', 0)
+        lookups = hits + self.counters.get('cache_misses', 0)
+        return hits / lookups if lookups else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'stages': {stage: dict(stats) for stage, stats in self.stages.items()},
+                'counters': dict(self.counters),
+                'cache_hit_ratio': self.cache_hit_ratio(),
+            }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix='fpl'):
+        """Returns the metrics in the Prometheus text exposition format."""
+        data = self.snapshot()
+        lines = []
+        stage_metrics = [('calls', 'counter', 'calls_total'), ('wall_seconds', 'counter', 'wall_seconds_total'),
+                         ('cpu_seconds', 'counter', 'cpu_seconds_total'), ('max_wall_seconds', 'gauge', 'max_wall_seconds')]
+        for key, kind, suffix in stage_metrics:
+            lines.append(f"# TYPE {prefix}_stage_{suffix} {kind}")
+            for stage, stats in sorted(data['stages'].items()):
+                lines.append(f'{prefix}_stage_{suffix}{{stage="{stage}"}} {stats[key]}')
+        for name, value in sorted(data['counters'].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        if data['cache_hit_ratio'] is not None:
+            lines.append(f"# TYPE {prefix}_cache_hit_ratio gauge")
+            lines.append(f"{prefix}_cache_hit_ratio {data['cache_hit_ratio']}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
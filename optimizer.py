@@ -0,0 +1,180 @@
+from constants import (
+    SQUAD_POSITION_COUNTS,
+    MAX_PLAYERS_PER_CLUB,
+    STARTING_POSITION_LIMITS,
+    STARTING_XI_SIZE,
+    BENCH_WEIGHT,
+    SQUAD_BUDGET,
+)
+from scipy.optimize import milp, LinearConstraint, Bounds
+from dataclasses import dataclass, field
+from scipy import sparse
+import logging
+import numpy
+
+
+@dataclass
+class Scenario():
+    """
+    One squad selection problem over a `SquadOptimizer`'s pool. Costs and budget are in the API's 0.1m units.
+
+    `points` replaces the optimizer's predicted points (e.g. predictions for another horizon), `exclude` and
+    `force` are player IDs from the pool that must stay out of or be in the squad.
+    """
+    name: str = None
+    budget: int = SQUAD_BUDGET
+    points: numpy.ndarray = None
+    exclude: list = field(default_factory=list)
+    force: list = field(default_factory=list)
+
+
+@dataclass
+class SquadSolution():
+    """
+    The optimal squad for a scenario. `predicted_points` counts the captain twice and the bench at `bench_weight`.
+    """
+    name: str
+    status: str
+    squad_ids: list = field(default_factory=list)
+    starting_ids: list = field(default_factory=list)
+    bench_ids: list = field(default_factory=list)
+    captain_id: int = None
+    predicted_points: float = None
+    cost: int = None
+
+
+class SquadOptimizer():
+    """
+    Exact squad, starting XI and captain selection as a mixed-integer program, solved with HiGHS through
+    `scipy.optimize.milp`.
+
+    Each player has three binary variables: in the squad, starting, captain. The constraints are the budget,
+    squad size per position, the per-club limit, the XI size and formation, starters and captain being in
+    the squad and starting, and exactly one captain. The sparse constraint matrix depends only on the pool,
+    so it is built once here and every scenario only changes the objective, the budget bound and the
+    variable bounds.
+    """
+
+    def __init__(self, ids, costs, positions, clubs, points, bench_weight=BENCH_WEIGHT):
+        self.ids = numpy.asarray(ids)
+        self.costs = numpy.asarray(costs, dtype=float)
+        self.positions = numpy.asarray(positions)
+        self.clubs = numpy.asarray(clubs)
+        self.points = numpy.asarray(points, dtype=float)
+        self.bench_weight = bench_weight
+        self.rows = {player_id: row for row, player_id in enumerate(self.ids.tolist())}
+        self.budget_row = 0
+        self.constraint_matrix, self.lower, self.upper = self.build_constraints()
+
+    @classmethod
+    def from_frame(cls, players, points, bench_weight=BENCH_WEIGHT):
+        """
+        Builds an optimizer from a player frame indexed by id with 'now_cost', 'element_type' and 'team' columns.
+
+        Args:
+            players (pandas.DataFrame): The player pool, e.g. `DataContainer.players`.
+            points (pandas.Series): Predicted points indexed by player id. Players without a prediction are given 0.
+        """
+        points = points.reindex(players.index).fillna(0)
+        return cls(players.index.to_numpy(), players['now_cost'].to_numpy(), players['element_type'].to_numpy(),
+                   players['team'].to_numpy(), points.to_numpy(), bench_weight)
+
+    def build_constraints(self):
+        """
+        Returns the sparse constraint matrix over [squad, starting, captain] variables and its row bounds.
+        The first row is the budget; its upper bound is set per scenario.
+        """
+        n = len(self.ids)
+        eye = sparse.identity(n, format='csr')
+        zeros = sparse.csr_matrix((n, n))
+        blocks, lower, upper = [], [], []
+
+        def add(squad_row, starting_row, captain_row, low, high):
+            blocks.append(sparse.hstack([squad_row, starting_row, captain_row]))
+            lower.extend(numpy.broadcast_to(low, squad_row.shape[0]))
+            upper.extend(numpy.broadcast_to(high, squad_row.shape[0]))
+
+        empty_row = sparse.csr_matrix((1, n))
+        add(sparse.csr_matrix(self.costs), empty_row, empty_row, -numpy.inf, numpy.inf)
+        for position, count in SQUAD_POSITION_COUNTS.items():
+            row = sparse.csr_matrix((self.positions == position).astype(float))
+            add(row, empty_row, empty_row, count, count)
+            low, high = STARTING_POSITION_LIMITS[position]
+            add(empty_row, row, empty_row, low, high)
+        club_values, club_index = numpy.unique(self.clubs, return_inverse=True)
+        club_rows = sparse.csr_matrix((numpy.ones(n), (club_index, numpy.arange(n))), shape=(len(club_values), n))
+        add(club_rows, sparse.csr_matrix(club_rows.shape), sparse.csr_matrix(club_rows.shape), -numpy.inf, MAX_PLAYERS_PER_CLUB)
+        ones = sparse.csr_matrix(numpy.ones((1, n)))
+        add(empty_row, ones, empty_row, STARTING_XI_SIZE, STARTING_XI_SIZE)
+        add(empty_row, empty_row, ones, 1, 1)
+        # starting <= squad, captain <= starting
+        add(-eye, eye, zeros, -numpy.inf, 0)
+        add(zeros, -eye, eye, -numpy.inf, 0)
+        return sparse.vstack(blocks, format='csr'), numpy.array(lower), numpy.array(upper)
+
+    def get_objective(self, points):
+        """
+        Returns the minimisation objective: starters at full points plus the captain again, the bench at `bench_weight`.
+        """
+        return -numpy.concatenate([self.bench_weight * points, (1 - self.bench_weight) * points, points])
+
+    def get_variable_bounds(self, scenario):
+        """
+        Returns the variable bounds with the scenario's excluded players kept out of the squad and its forced ones in.
+
+        Raises:
+            ValueError: If an excluded or forced player is not in the pool.
+        """
+        n = len(self.ids)
+        lower, upper = numpy.zeros(3 * n), numpy.ones(3 * n)
+        unknown = [player_id for player_id in list(scenario.exclude) + list(scenario.force) if player_id not in self.rows]
+        if unknown:
+            raise ValueError(f"Scenario {scenario.name} excludes or forces players not in the pool: {unknown}")
+        for player_id in scenario.exclude:
+            upper[self.rows[player_id]] = 0
+        for player_id in scenario.force:
+            lower[self.rows[player_id]] = 1
+        return Bounds(lower, upper)
+
+    def solve(self, scenario=None):
+        """
+        Solves one scenario.
+
+        Args:
+            scenario (Scenario): The problem to solve. Defaults to the optimizer's points and the full budget.
+
+        Returns:
+            SquadSolution: The optimal squad, or one with status 'infeasible' (or HiGHS' message) and no players.
+        """
+        scenario = scenario or Scenario()
+        points = self.points if scenario.points is None else numpy.asarray(scenario.points, dtype=float)
+        upper = self.upper.copy()
+        upper[self.budget_row] = scenario.budget
+        n = len(self.ids)
+        result = milp(self.get_objective(points), integrality=numpy.ones(3 * n),
+                      bounds=self.get_variable_bounds(scenario),
+                      constraints=LinearConstraint(self.constraint_matrix, self.lower, upper))
+        if result.x is None:
+            logging.warning(f"No squad for scenario {scenario.name}: {result.message}")
+            return SquadSolution(scenario.name, 'infeasible' if result.status == 2 else result.message)
+        chosen = numpy.round(result.x).astype(bool)
+        squad, starting, captain = chosen[:n], chosen[n:2 * n], chosen[2 * n:]
+        return SquadSolution(
+            name=scenario.name,
+            status='optimal' if result.status == 0 else result.message,
+            squad_ids=self.ids[squad].tolist(),
+            starting_ids=self.ids[starting].tolist(),
+            bench_ids=self.ids[squad & ~starting].tolist(),
+            captain_id=self.ids[captain].tolist()[0],
+            predicted_points=float(-result.fun),
+            cost=int(round(self.costs[squad].sum())),
+        )
+
+    def solve_many(self, scenarios):
+        """
+        Solves a batch of scenarios against the same constraint matrix.
+
+        Returns:
+            list: A `SquadSolution` per scenario, in order.
+        """
+        return [self.solve(scenario) for scenario in scenarios]
@@ -0,0 +1,137 @@
+from constants import MODEL_FEATURES, MODEL_PATH, PREDICTION_CACHE_SIZE
+from collections import OrderedDict
+from metrics import METRICS
+import threading
+import logging
+import hashlib
+import joblib
+import pandas
+import numpy
+import os
+
+
+class Predictor():
+    """
+    Long-lived wrapper around the trained model in `fpl_model.pkl`.
+
+    The model is loaded once and checked against `MODEL_FEATURES`. Every call scores a whole frame (all the
+    players of a gameweek and horizon) in a single `predict`. Predictions are cached by (snapshot key, model
+    hash), so repeated what-if queries over the same players never re-run inference. A retrained model written
+    over the same path is picked up on the next call when `auto_reload` is on, or explicitly with `reload()`.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, features=MODEL_FEATURES, cache_size=PREDICTION_CACHE_SIZE, auto_reload=True):
+        self.model_path = model_path
+        self.features = list(features)
+        self.cache_size = cache_size
+        self.auto_reload = auto_reload
+        self._predictions = OrderedDict()
+        self._lock = threading.RLock()
+        self.model = None
+        self.model_hash = None
+        self._model_stat = None
+        self.reload()
+
+    def reload(self):
+        """
+        Loads the model from `model_path`, replacing the current one.
+
+        Raises:
+            ValueError: If the model was fitted on different features, or in a different order, than `features`.
+        """
+        with self._lock:
+            with open(self.model_path, 'rb') as f:
+                model_hash = hashlib.sha256(f.read()).hexdigest()
+            model = joblib.load(self.model_path)
+            self.validate_features(model)
+            self.model, self.model_hash = model, model_hash
+            stat = os.stat(self.model_path)
+            self._model_stat = (stat.st_mtime_ns, stat.st_size)
+            logging.info(f"Loaded model {self.model_path} ({model_hash[:10]})")
+
+    def reload_if_changed(self):
+        """
+        Reloads the model if the file at `model_path` changed since it was loaded.
+
+        Returns:
+            bool: True if the model was reloaded.
+        """
+        stat = os.stat(self.model_path)
+        if (stat.st_mtime_ns, stat.st_size) == self._model_stat:
+            return False
+        self.reload()
+        return True
+
+    def validate_features(self, model):
+        fitted = getattr(model, 'feature_names_in_', None)
+        if fitted is not None and list(fitted) != self.features:
+            raise ValueError(f"Model was fitted on features {list(fitted)}, expected {self.features}")
+        n_features = getattr(model, 'n_features_in_', None)
+        if n_features is not None and n_features != len(self.features):
+            raise ValueError(f"Model was fitted on {n_features} features, expected {len(self.features)}")
+
+    def model_inputs(self, X):
+        """
+        Returns the model's input frame for `X`: the model features in fitted order with NaN filled as 0. Extra
+        columns (e.g. ID_FEATURES) are ignored.
+
+        Raises:
+            KeyError: If a model feature is missing from `X`.
+        """
+        missing = [feature for feature in self.features if feature not in X.columns]
+        if missing:
+            raise KeyError(f"Missing model features: {missing}")
+        X = X.loc[:, ~X.columns.duplicated()]
+        return X[self.features].astype(float).fillna(0)
+
+    @staticmethod
+    def snapshot_key(inputs):
+        """Returns a content hash of a model input frame, used as the snapshot key when none is given."""
+        row_hashes = pandas.util.hash_pandas_object(inputs, index=False).to_numpy()
+        return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+    def predict(self, X, snapshot_key=None):
+        """
+        Predicts future points for every row of `X` in one batch. Rows without a fixture in the horizon
+        (`num_fixtures == 0`) are predicted 0.
+
+        Args:
+            X (pandas.DataFrame): Player features, e.g. `DataProcessor.training_data[0]`.
+            snapshot_key (hashable): Identifies the inputs, e.g. (gw, horizon). Defaults to a hash of the model inputs,
+                so only pass one when it changes whenever the inputs do.
+
+        Returns:
+            pandas.Series: Predicted future points, indexed like `X`.
+        """
+        if self.auto_reload:
+            self.reload_if_changed()
+        inputs = self.model_inputs(X)
+        with self._lock:
+            key = (snapshot_key if snapshot_key is not None else self.snapshot_key(inputs), self.model_hash)
+            predictions = self._predictions.get(key)
+            if predictions is not None and len(predictions) == len(inputs):
+                self._predictions.move_to_end(key)
+                METRICS.increment('prediction_cache_hits')
+            else:
+                METRICS.increment('prediction_cache_misses')
+                with METRICS.timed('Predictor.predict'):
+                    predictions = numpy.asarray(self.model.predict(inputs), dtype=float)
+                if 'num_fixtures' in inputs.columns:
+                    predictions[inputs['num_fixtures'].to_numpy() == 0] = 0
+                predictions.setflags(write=False)
+                self._predictions[key] = predictions
+                if len(self._predictions) > self.cache_size:
+                    self._predictions.popitem(last=False)
+        return pandas.Series(predictions.copy(), index=X.index, name='predicted_future_points')
+
+    def score(self, X, snapshot_key=None):
+        """
+        Returns a copy of `X` with a 'predicted_future_points' column, the frame the squad selection works on.
+        """
+        scored = X.loc[:, ~X.columns.duplicated()].fillna(0)
+        scored['predicted_future_points'] = self.predict(X, snapshot_key)
+        return scored
+
+    def clear_cache(self):
+        with self._lock:
+            self._predictions.clear()
@@ -0,0 +1,272 @@
+from constants import SIMULATION_COUNT, SIMULATION_PERCENTILES
+from utils import get_player_history_store
+import logging
+import pandas
+import numpy
+
+
+def draw_rounds(rng, valid, rows):
+    """
+    Draws one of each given row's valid rounds uniformly at random.
+
+    Args:
+        rng (numpy.random.Generator): The random generator.
+        valid (numpy.ndarray): Rows x rounds mask of the rounds each row can be drawn from.
+        rows (numpy.ndarray): The row to draw for at each position, of any shape.
+
+    Returns:
+        numpy.ndarray: Round indices into `valid`'s columns, shaped like `rows`. Rows without a valid round get 0.
+    """
+    counts = valid.sum(axis=1)
+    # Each row's valid rounds first, in order, so a draw is an index below the row's count
+    valid_first = numpy.argsort(~valid, axis=1, kind='stable')
+    picks = (rng.random(rows.shape, dtype=numpy.float32) * counts[rows]).astype(numpy.int64)
+    picks = numpy.minimum(picks, numpy.maximum(counts - 1, 0)[rows])
+    return valid_first.ravel()[rows * valid.shape[1] + picks]
+
+
+class PointsSimulator():
+    """
+    Monte Carlo simulation of player points as a simulations x players matrix, for judging squads, captains,
+    transfers and rivals by their spread of outcomes rather than only their expected points.
+
+    Each simulated gameweek resamples a past round of the players' element-summary histories. Rounds are drawn
+    per club, so teammates' outcomes come from the same match and keep their correlation. A player who did not
+    feature in their club's drawn round (e.g. a recent signing) falls back to one of their own rounds. Blanks in
+    history are skipped, while appearances with 0 minutes stay in as the player's minutes risk.
+
+    Given predictions, each player's draws are scaled so their mean is the predicted points. Their shape
+    (variance, blanks, hauls) still comes from history. Players with no usable history score their prediction
+    in every simulation.
+
+    Attributes:
+        player_ids (numpy.ndarray): The players, in column order.
+        outcomes (numpy.ndarray): Simulations x players float32 matrix of points over the horizon.
+    """
+
+    def __init__(self, history_store, player_ids, clubs, predictions=None, horizon=1, num_simulations=SIMULATION_COUNT,
+                 lookback=None, correlate_teammates=True, seed=None):
+        """
+        Args:
+            history_store (PlayerHistoryStore): Histories covering the players.
+            player_ids (array-like): The players to simulate.
+            clubs (array-like): Each player's club, aligned with `player_ids`.
+            predictions (array-like): Predicted points over the horizon, aligned with `player_ids`. Optional.
+            horizon (int): Gameweeks simulated and summed per simulation.
+            num_simulations (int): Number of simulations.
+            lookback (int): Only resample the last `lookback` rounds of history. Defaults to all of them.
+            correlate_teammates (bool): Draw one round per club rather than one per player.
+            seed (int): Seed for reproducible draws.
+        """
+        self.player_ids = numpy.asarray(player_ids, dtype=numpy.int64)
+        self.columns = {player_id: column for column, player_id in enumerate(self.player_ids.tolist())}
+        self.clubs = numpy.asarray(clubs)
+        self.horizon = horizon
+        self.num_simulations = num_simulations
+        self.correlate_teammates = correlate_teammates
+        self.rng = numpy.random.default_rng(seed)
+        points, valid = self.get_history(history_store, lookback)
+        self.outcomes = self.simulate(points, valid)
+        if predictions is not None:
+            self.outcomes = self.scale_to_predictions(self.outcomes, points, valid, numpy.asarray(predictions, dtype=float))
+
+    @classmethod
+    def from_frame(cls, players, predictions=None, history_store=None, **kwargs):
+        """
+        Builds a simulator from a player frame indexed by id with a 'team' column.
+
+        Args:
+            players (pandas.DataFrame): The player pool, e.g. `DataContainer.players`.
+            predictions (pandas.Series): Predicted points indexed by player id. Players without a prediction are given 0.
+            history_store (PlayerHistoryStore): Histories to use. Defaults to loading them for the pool.
+        """
+        history_store = get_player_history_store(players.index, history_store)
+        if predictions is not None:
+            predictions = predictions.reindex(players.index).fillna(0).to_numpy()
+        return cls(history_store, players.index.to_numpy(), players['team'].to_numpy(), predictions, **kwargs)
+
+    def get_history(self, history_store, lookback):
+        """
+        Returns the players' points per round and the mask of rounds they featured in, over the rounds resampled.
+        """
+        rows, known = history_store.rows_for(self.player_ids)
+        first = 1 if lookback is None else max(1, history_store.num_rounds - lookback + 1)
+        points = numpy.where(known[:, None], history_store.points[rows, first:], 0).astype(numpy.float32)
+        valid = known[:, None] & (history_store.played[rows, first:] > 0)
+        return points, valid
+
+    def simulate(self, points, valid):
+        num_players, num_rounds = valid.shape
+        outcomes = numpy.zeros((self.num_simulations, num_players), dtype=numpy.float32)
+        if not valid.any():
+            return outcomes
+        # Flat (player, round) offsets, so every gather below is a single 1-D take
+        offsets = numpy.arange(num_players) * num_rounds
+        points, valid_flat = points.ravel(), valid.ravel()
+        club_values, club_index = numpy.unique(self.clubs, return_inverse=True)
+        club_valid = numpy.zeros((len(club_values), num_rounds), dtype=bool)
+        numpy.logical_or.at(club_valid, club_index, valid)
+        for _ in range(self.horizon):
+            if self.correlate_teammates:
+                club_rounds = draw_rounds(self.rng, club_valid, numpy.broadcast_to(numpy.arange(len(club_values)), (self.num_simulations, len(club_values))))
+                cells = club_rounds[:, club_index] + offsets
+                # Players who did not feature in their club's round draw one of their own
+                missed_sims, missed_players = numpy.nonzero(~valid_flat[cells])
+                cells[missed_sims, missed_players] = draw_rounds(self.rng, valid, missed_players) + offsets[missed_players]
+            else:
+                cells = draw_rounds(self.rng, valid, numpy.broadcast_to(numpy.arange(num_players), outcomes.shape)) + offsets
+            outcomes += points[cells]
+        # Players who never featured drew round 0, which they did not play
+        outcomes[:, ~valid.any(axis=1)] = 0
+        return outcomes
+
+    def scale_to_predictions(self, outcomes, points, valid, predictions):
+        counts = valid.sum(axis=1)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            expected = self.horizon * numpy.where(valid, points, 0).sum(axis=1) / counts
+            scale = numpy.where(expected > 0, predictions / expected, 0)
+        outcomes *= scale.astype(numpy.float32)
+        no_history = ~(expected > 0)
+        outcomes[:, no_history] = predictions[no_history]
+        logging.info(f"Scaled simulations to predictions; {int(no_history.sum())} players without usable history score their prediction")
+        return outcomes
+
+    def get_multipliers(self, selections):
+        """
+        Returns a selections x players matrix of multipliers.
+
+        Args:
+            selections (list): Each a dict of player ID to multiplier (e.g. 2 for the captain, 1 for other
+                starters, 0 on the bench), or a `SquadSolution`. Players outside the pool are ignored.
+        """
+        multipliers = numpy.zeros((len(selections), len(self.player_ids)), dtype=numpy.float32)
+        missing = set()
+        for row, selection in enumerate(selections):
+            if not isinstance(selection, dict):
+                selection = self.get_lineup(selection.starting_ids, selection.captain_id)
+            for player_id, multiplier in selection.items():
+                if player_id in self.columns:
+                    multipliers[row, self.columns[player_id]] = multiplier
+                else:
+                    missing.add(player_id)
+        if missing:
+            logging.warning(f"{len(missing)} selected players are not in the simulated pool and score 0: {sorted(missing)[:10]}")
+        return multipliers
+
+    @staticmethod
+    def get_lineup(starting_ids, captain_id=None):
+        """
+        Returns the multipliers of a starting XI: 1 per starter and 2 for the captain.
+        """
+        lineup = {player_id: 1 for player_id in starting_ids}
+        if captain_id is not None:
+            lineup[captain_id] = 2
+        return lineup
+
+    def score(self, multipliers):
+        """
+        Returns the simulations x selections matrix of points scored by each row of `multipliers`.
+        """
+        return self.outcomes @ numpy.asarray(multipliers, dtype=numpy.float32).T
+
+    @staticmethod
+    def summarize(points, names=None, percentiles=SIMULATION_PERCENTILES):
+        """
+        Returns the mean, standard deviation and percentiles of each column of a simulations x selections matrix.
+        """
+        points = numpy.asarray(points).reshape(len(points), -1)
+        summary = pandas.DataFrame({'mean': points.mean(axis=0), 'std': points.std(axis=0)}, index=names)
+        for percentile, values in zip(percentiles, numpy.percentile(points, percentiles, axis=0)):
+            summary[f'p{percentile}'] = values
+        return summary
+
+    @staticmethod
+    def beat_probability(points, rival_points):
+        """
+        Returns the probability of each selection scoring more than each rival, counting ties as half.
+
+        Args:
+            points (numpy.ndarray): Simulations x selections points.
+            rival_points (numpy.ndarray): Simulations x rivals points from the same simulations.
+
+        Returns:
+            numpy.ndarray: Selections x rivals probabilities.
+        """
+        points = numpy.asarray(points).reshape(len(points), -1)[:, :, None]
+        rival_points = numpy.asarray(rival_points).reshape(len(rival_points), -1)[:, None, :]
+        return (points > rival_points).mean(axis=0) + 0.5 * (points == rival_points).mean(axis=0)
+
+    def evaluate_squads(self, squads, names=None, rivals=None):
+        """
+        Summarizes the simulated points of several squads at once.
+
+        Args:
+            squads (list): Selections as for `get_multipliers`, e.g. `SquadSolution`s from `SquadOptimizer.solve_many`.
+            names (list): A label per squad. Defaults to the solutions' names, or positions.
+            rivals (dict): Rival name to its selection, e.g. league entries' picks as {element: multiplier}. Each
+                rival adds a column with every squad's probability of beating it.
+
+        Returns:
+            pandas.DataFrame: One row per squad.
+        """
+        if names is None:
+            names = [getattr(squad, 'name', None) or index for index, squad in enumerate(squads)]
+        points = self.score(self.get_multipliers(squads))
+        summary = self.summarize(points, names)
+        if rivals:
+            probabilities = self.beat_probability(points, self.score(self.get_multipliers(list(rivals.values()))))
+            for column, rival in enumerate(rivals):
+                summary[f'p_beat_{rival}'] = probabilities[:, column]
+        return summary
+
+    def evaluate_captains(self, starting_ids, candidates=None):
+        """
+        Summarizes an XI's simulated points under each captain choice.
+
+        Args:
+            starting_ids (list): The starting XI.
+            candidates (list): The captains to compare. Defaults to every starter.
+
+        Returns:
+            pandas.DataFrame: One row per candidate, best mean first, with the probability that the candidate
+            outscores every other candidate ('p_top_scorer').
+        """
+        candidates = list(starting_ids if candidates is None else candidates)
+        xi_points = self.score(self.get_multipliers([self.get_lineup(starting_ids)]))
+        captain_points = self.outcomes[:, [self.columns[player_id] for player_id in candidates]]
+        summary = self.summarize(xi_points + captain_points, pandas.Index(candidates, name='captain_id'))
+        best = captain_points.argmax(axis=1)
+        summary['p_top_scorer'] = numpy.bincount(best, minlength=len(candidates)) / len(best)
+        return summary.sort_values('mean', ascending=False)
+
+    def evaluate_transfers(self, starting_ids, captain_id, moves):
+        """
+        Summarizes the XI's simulated points after each candidate move, net of its hit, next to holding.
+
+        Each player in takes the place of the player out at the same index of the move, who plays the same
+        position, in the XI (and the armband, if the captain goes), so players in for benched players score
+        nothing over the horizon.
+
+        Args:
+            starting_ids (list): The current starting XI.
+            captain_id (int): The current captain.
+            moves (list): `TransferMove`s, e.g. from `TransferSearch.search`.
+
+        Returns:
+            pandas.DataFrame: One row for holding and one per move, with the probability of beating holding.
+        """
+        lineup = self.get_lineup(starting_ids, captain_id)
+        selections, names = [lineup], ['hold']
+        for move in moves:
+            selection = dict(lineup)
+            for out_id, in_id in zip(move.out_ids, move.in_ids):
+                multiplier = selection.pop(out_id, 0)
+                if multiplier:
+                    selection[in_id] = multiplier
+            selections.append(selection)
+            names.append(f"{','.join(map(str, move.out_ids))}->{','.join(map(str, move.in_ids))}")
+        hits = numpy.array([0] + [move.hit for move in moves], dtype=numpy.float32)
+        points = self.score(self.get_multipliers(selections)) - hits
+        summary = self.summarize(points, pandas.Index(names, name='move'))
+        summary['p_beat_hold'] = self.beat_probability(points, points[:, 0])[:, 0]
+        return summary
@@ -0,0 +1,165 @@
+from constants import SNAPSHOT_ARCHIVE_DIR
+from snapshot_loader import load_elements_frame, infer_array
+import logging
+import shutil
+import pandas
+import numpy
+import json
+import os
+
+ARCHIVED_TABLES = ('elements', 'teams')
+
+
+def to_archive_column(values):
+    """
+    Returns the array to save for one column and its meta entry. Numbers and booleans are saved as they are
+    (already narrowed by `ELEMENT_SCHEMA`); anything else is dictionary-encoded as integer codes, with -1 for
+    nulls, and the distinct values kept in the meta entry.
+    """
+    if isinstance(values, pandas.Categorical) or values.dtype == object:
+        codes, uniques = pandas.factorize(numpy.asarray(values, dtype=object))
+        code_dtype = numpy.int16 if len(uniques) < numpy.iinfo(numpy.int16).max else numpy.int32
+        categorical = isinstance(values, pandas.Categorical)
+        return codes.astype(code_dtype), {'encoding': 'category' if categorical else 'dictionary', 'values': uniques.tolist()}
+    return numpy.asarray(values), {'encoding': 'plain'}
+
+
+def from_archive_column(array, meta):
+    if meta['encoding'] == 'plain':
+        return array
+    if meta['encoding'] == 'category':
+        return pandas.Categorical.from_codes(numpy.asarray(array), categories=meta['values'])
+    values = numpy.array(meta['values'] + [None], dtype=object)
+    return values[numpy.asarray(array)]  # -1 picks the trailing None
+
+
+class ArchivedSnapshot():
+    """
+    Lazy handle on one archived gameweek snapshot. Nothing is read until a table is asked for, and then only the
+    requested columns are memory-mapped. The handle pickles as its path, so a container holding handles stays small.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._meta = {}
+
+    def __getstate__(self):
+        return {'path': self.path, '_meta': {}}
+
+    def meta(self, table):
+        if table not in self._meta:
+            with open(os.path.join(self.path, table, 'meta.json')) as f:
+                self._meta[table] = json.load(f)
+        return self._meta[table]
+
+    def columns(self, table):
+        return list(self.meta(table)['columns'])
+
+    def read_table(self, table, fields=None, index=None):
+        """
+        Returns a table (or the requested columns of it) as a DataFrame.
+
+        Args:
+            table (str): 'elements' or 'teams'.
+            fields (iterable): The columns to read. Fields not in the archive are skipped. Defaults to every column.
+            index (str): A column to index the frame by; it is always read.
+
+        Returns:
+            pandas.DataFrame: The table.
+        """
+        meta = self.meta(table)
+        wanted = list(meta['columns']) if fields is None else list(dict.fromkeys(fields))
+        if index is not None and index not in wanted:
+            wanted.insert(0, index)
+        data = {}
+        for name in wanted:
+            if name not in meta['columns']:
+                continue
+            array = numpy.load(os.path.join(self.path, table, f"{name}.npy"), mmap_mode='r')
+            data[name] = from_archive_column(array, meta['columns'][name])
+        df = pandas.DataFrame(data)
+        if index is not None:
+            df.set_index(index, inplace=True)
+        return df
+
+    def elements_frame(self, fields=None):
+        """
+        Returns the typed player frame indexed by 'id', like `load_elements_frame` on the raw snapshot.
+        """
+        df = self.read_table('elements', fields, index='id')
+        logging.info(f"Loaded {len(df)} archived players with {df.shape[1]} columns")
+        return df
+
+    def teams_frame(self, fields=None):
+        return self.read_table('teams', fields)
+
+
+class SnapshotArchive():
+    """
+    On-disk archive of raw bootstrap-static snapshots, one per gameweek, keeping only the `elements` and `teams`
+    tables as columnar, memory-mappable `.npy` files.
+
+    Each column is saved with the narrow dtype declared in `ELEMENT_SCHEMA` (e.g. int16 costs, float32 stats),
+    and text columns are dictionary-encoded as integer codes, so a snapshot takes a fraction of its JSON size.
+    The `meta.json` of each table is written last and marks it complete.
+
+    Layout: `{root}/season={season}/gw={gw}/{table}/{column}.npy`
+    """
+
+    def __init__(self, season, root=SNAPSHOT_ARCHIVE_DIR):
+        self.season = season
+        self.root = os.path.join(root, f"season={season}")
+
+    def snapshot_path(self, gw):
+        return os.path.join(self.root, f"gw={gw}")
+
+    def has(self, gw):
+        return all(os.path.exists(os.path.join(self.snapshot_path(gw), table, 'meta.json')) for table in ARCHIVED_TABLES)
+
+    def gameweeks(self):
+        """
+        Returns the sorted list of gameweeks with a complete snapshot.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(gw for gw in (int(name.split('=')[1]) for name in os.listdir(self.root) if name.startswith('gw=') and '.' not in name)
+                      if self.has(gw))
+
+    def get(self, gw):
+        """
+        Returns a lazy `ArchivedSnapshot` for a gameweek, or None if it is not archived.
+        """
+        return ArchivedSnapshot(self.snapshot_path(gw)) if self.has(gw) else None
+
+    def write(self, gw, snapshot):
+        """
+        Archives one bootstrap-static snapshot, replacing any existing one for the gameweek.
+
+        Args:
+            gw (int): The gameweek the snapshot was taken at.
+            snapshot (dict): The JSON-decoded bootstrap-static snapshot.
+
+        Returns:
+            ArchivedSnapshot: A handle on the archived snapshot.
+        """
+        path = self.snapshot_path(gw)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tables = {
+            'elements': {name: column.array if isinstance(column.dtype, pandas.CategoricalDtype) else column.to_numpy()
+                         for name, column in load_elements_frame(snapshot['elements']).reset_index().items()},
+            'teams': {field: infer_array([team.get(field) for team in snapshot['teams']])
+                      for field in (snapshot['teams'][0].keys() if snapshot['teams'] else [])},
+        }
+        for table, columns in tables.items():
+            os.makedirs(os.path.join(tmp_path, table))
+            meta = {'rows': len(snapshot[table]), 'columns': {}}
+            for name, values in columns.items():
+                array, meta['columns'][name] = to_archive_column(values)
+                numpy.save(os.path.join(tmp_path, table, f"{name}.npy"), array)
+            with open(os.path.join(tmp_path, table, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        logging.info(f"Archived gameweek {gw} snapshot with {len(snapshot['elements'])} players to {path}")
+        return ArchivedSnapshot(path)
@@ -0,0 +1,177 @@
+from metrics import METRICS
+import logging
+import pandas
+import numpy
+
+# Declared dtype for every field of a bootstrap-static `elements` entry. Fields that can be null are floats so
+# they can hold NaN; strings the API sends for decimal stats ('4.2') are parsed straight into floats.
+ELEMENT_SCHEMA = {
+    'id': 'int32',
+    'code': 'int32',
+    'team': 'int16',
+    'team_code': 'int16',
+    'element_type': 'int8',
+    'web_name': 'category',
+    'first_name': 'object',
+    'second_name': 'object',
+    'status': 'category',
+    'news': 'object',
+    'news_added': 'object',
+    'photo': 'object',
+    'opta_code': 'object',
+    'region': 'float32',
+    'team_join_date': 'object',
+    'birth_date': 'object',
+    'squad_number': 'float32',
+    'can_transact': 'bool',
+    'can_select': 'bool',
+    'in_dreamteam': 'bool',
+    'removed': 'bool',
+    'special': 'bool',
+    'has_temporary_code': 'bool',
+    'chance_of_playing_next_round': 'float32',
+    'chance_of_playing_this_round': 'float32',
+    'now_cost': 'int16',
+    'cost_change_event': 'int16',
+    'cost_change_event_fall': 'int16',
+    'cost_change_start': 'int16',
+    'cost_change_start_fall': 'int16',
+    'dreamteam_count': 'int16',
+    'ep_next': 'float32',
+    'ep_this': 'float32',
+    'event_points': 'int16',
+    'form': 'float32',
+    'points_per_game': 'float32',
+    'selected_by_percent': 'float32',
+    'total_points': 'int16',
+    'transfers_in': 'int32',
+    'transfers_in_event': 'int32',
+    'transfers_out': 'int32',
+    'transfers_out_event': 'int32',
+    'value_form': 'float32',
+    'value_season': 'float32',
+    'minutes': 'int32',
+    'goals_scored': 'int16',
+    'assists': 'int16',
+    'clean_sheets': 'int16',
+    'goals_conceded': 'int16',
+    'own_goals': 'int16',
+    'penalties_saved': 'int16',
+    'penalties_missed': 'int16',
+    'yellow_cards': 'int16',
+    'red_cards': 'int16',
+    'saves': 'int16',
+    'bonus': 'int16',
+    'bps': 'int32',
+    'influence': 'float32',
+    'creativity': 'float32',
+    'threat': 'float32',
+    'ict_index': 'float32',
+    'starts': 'int16',
+    'expected_goals': 'float32',
+    'expected_assists': 'float32',
+    'expected_goal_involvements': 'float32',
+    'expected_goals_conceded': 'float32',
+    'mng_win': 'int16',
+    'mng_draw': 'int16',
+    'mng_loss': 'int16',
+    'mng_underdog_win': 'int16',
+    'mng_underdog_draw': 'int16',
+    'mng_clean_sheets': 'int16',
+    'mng_goals_scored': 'int16',
+    'influence_rank': 'int16',
+    'influence_rank_type': 'int16',
+    'creativity_rank': 'int16',
+    'creativity_rank_type': 'int16',
+    'threat_rank': 'int16',
+    'threat_rank_type': 'int16',
+    'ict_index_rank': 'int16',
+    'ict_index_rank_type': 'int16',
+    'corners_and_indirect_freekicks_order': 'float32',
+    'corners_and_indirect_freekicks_text': 'object',
+    'direct_freekicks_order': 'float32',
+    'direct_freekicks_text': 'object',
+    'penalties_order': 'float32',
+    'penalties_text': 'object',
+    'expected_goals_per_90': 'float32',
+    'saves_per_90': 'float32',
+    'expected_assists_per_90': 'float32',
+    'expected_goal_involvements_per_90': 'float32',
+    'expected_goals_conceded_per_90': 'float32',
+    'goals_conceded_per_90': 'float32',
+    'now_cost_rank': 'int16',
+    'now_cost_rank_type': 'int16',
+    'form_rank': 'int16',
+    'form_rank_type': 'int16',
+    'points_per_game_rank': 'int16',
+    'points_per_game_rank_type': 'int16',
+    'selected_rank': 'int16',
+    'selected_rank_type': 'int16',
+    'starts_per_90': 'float32',
+    'clean_sheets_per_90': 'float32',
+}
+
+
+def to_typed_array(values, dtype):
+    """
+    Converts a list of raw JSON values to an array of the declared dtype. Values that cannot be converted
+    directly (e.g. a null in an integer field, or a value outside the dtype's range) fall back to a float array,
+    with NaN in place of the nulls.
+    """
+    if dtype == 'category':
+        return pandas.Categorical(values)
+    if dtype == 'object':
+        return numpy.array(values, dtype=object)
+    try:
+        return numpy.array(values, dtype=dtype)
+    except (TypeError, ValueError, OverflowError):
+        return pandas.to_numeric(pandas.Series(values), errors='coerce').to_numpy(dtype='float32')
+
+
+def infer_array(values):
+    """
+    Converts a list of raw JSON values for a field missing from `ELEMENT_SCHEMA`: numeric if every value parses, object otherwise.
+    """
+    try:
+        return pandas.to_numeric(pandas.Series(values)).to_numpy()
+    except (TypeError, ValueError):
+        return numpy.array(values, dtype=object)
+
+
+def load_elements_frame(elements, fields=None, schema=ELEMENT_SCHEMA):
+    """
+    Builds a typed player DataFrame directly from a bootstrap-static `elements` list.
+
+    Args:
+        elements (list): The `elements` list of a bootstrap-static snapshot.
+        fields (iterable): The fields to materialise. 'id' is always included. Fields not present in the
+            elements are skipped. Defaults to every field of the first element.
+        schema (dict): Field name to dtype, see `ELEMENT_SCHEMA`. Fields missing from it have their dtype inferred.
+
+    Returns:
+        pandas.DataFrame: One row per element, indexed by 'id'.
+    """
+    if not elements:
+        return pandas.DataFrame(index=pandas.Index([], name='id'))
+    available = elements[0].keys()
+    fields = list(available) if fields is None else ['id'] + [field for field in dict.fromkeys(fields) if field != 'id']
+    columns = {}
+    for field in fields:
+        if field not in available:
+            continue
+        values = [element.get(field) for element in elements]
+        columns[field] = to_typed_array(values, schema[field]) if field in schema else infer_array(values)
+    df = pandas.DataFrame(columns)
+    df.set_index('id', inplace=True)
+    METRICS.increment('snapshot_rows_loaded', len(df))
+    logging.info(f"Loaded {len(df)} players with {df.shape[1]} typed columns")
+    return df
+
+
+def with_object_categoricals(df):
+    """
+    Returns the frame with categorical columns converted back to object, for output handed to code that
+    fills or mixes values freely (e.g. `fillna(0)` over a whole training frame).
+    """
+    categoricals = [column for column, dtype in df.dtypes.items() if isinstance(dtype, pandas.CategoricalDtype)]
+    return df.astype({column: object for column in categoricals}) if categoricals else df
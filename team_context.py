@@ -0,0 +1,37 @@
+from constants import TEAM_ID
+from utils import get_player_ids_for_entry
+import logging
+
+
+class TeamContext():
+    """
+    Lazily loaded picks for an FPL entry, cached per (entry, gameweek).
+
+    Nothing is fetched until `player_ids` is first called for a gameweek, and each instance holds its own
+    cache, so building one is free and separate pipelines (or gameweeks processed in parallel) never share
+    mutable module state.
+    """
+
+    def __init__(self, entry_id=TEAM_ID):
+        self.entry_id = entry_id
+        self._picks = {}
+
+    def player_ids(self, gw, entry_id=None):
+        """
+        Returns the IDs of the players picked by an entry in a gameweek.
+
+        Args:
+            gw (int): The gameweek to get the picks for.
+            entry_id (int): The entry to get the picks for. Defaults to this context's entry.
+
+        Returns:
+            list: The picked player IDs, or an empty list if the picks could not be fetched.
+        """
+        key = (entry_id or self.entry_id, gw)
+        if key not in self._picks:
+            try:
+                self._picks[key] = get_player_ids_for_entry(*key)
+            except Exception as e:
+                logging.warning(f"Could not fetch picks for entry {key[0]} in gameweek {gw}: {e}")
+                return []
+        return self._picks[key]
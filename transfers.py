@@ -0,0 +1,205 @@
+from constants import MAX_PLAYERS_PER_CLUB, TRANSFER_HIT_COST
+from dataclasses import dataclass
+from itertools import combinations
+import numpy
+
+# Clubs that can be full (MAX_PLAYERS_PER_CLUB players) in a 15-player squad, used to bound dominance pruning.
+MAX_FULL_CLUBS = 15 // MAX_PLAYERS_PER_CLUB
+# Feasible (out, in) pairs whose club counts are checked at once while walking them in order of gain.
+CLUB_CHECK_BLOCK = 256
+
+
+@dataclass
+class TransferMove():
+    """
+    One candidate set of transfers. Costs are in the API's 0.1m units, points are predicted points.
+    `out_ids` and `in_ids` are position-aligned: `in_ids[i]` plays the same position as, and replaces, `out_ids[i]`.
+    """
+    out_ids: tuple
+    in_ids: tuple
+    points_gain: float
+    hit: int
+    net_gain: float
+    cost_change: int
+
+
+def get_undominated(costs, points, clubs, num_clubs, num_transfers, max_full_clubs=MAX_FULL_CLUBS):
+    """
+    Returns a mask of the candidates (all of one position) worth considering for a move of `num_transfers` transfers.
+
+    A candidate is dominated by another that costs no more and scores no fewer points (ties broken by position
+    in the arrays). Any move bringing in a dominated candidate can swap it for a dominator that is not already
+    part of the move and whose club has room, unless every dominator is blocked, so a candidate is dropped once
+    it has `num_transfers` dominators at its own club (swapping within a club leaves club counts unchanged) or
+    dominators at `num_transfers + max_full_clubs` different clubs (at most `num_transfers - 1` are in the
+    move and at most `max_full_clubs` clubs are full).
+    """
+    c_i, c_j = costs[:, None], costs[None, :]
+    p_i, p_j = points[:, None], points[None, :]
+    order = numpy.arange(len(costs))
+    tie = (c_j == c_i) & (p_j == p_i) & (order[None, :] < order[:, None])
+    dominated_by = (c_j <= c_i) & (p_j >= p_i) & ((c_j < c_i) | (p_j > p_i) | tie)
+    same_club = clubs[:, None] == clubs[None, :]
+    club_dominators = (dominated_by & same_club).sum(axis=1)
+    club_one_hot = numpy.eye(num_clubs, dtype=numpy.int32)[clubs]
+    dominating_clubs = ((dominated_by.astype(numpy.int32) @ club_one_hot) > 0).sum(axis=1)
+    return (club_dominators < num_transfers) & (dominating_clubs < num_transfers + max_full_clubs)
+
+
+class TransferSearch():
+    """
+    Searches 1- to k-transfer moves for a squad over a player pool held as NumPy arrays.
+
+    Moves respect the bank, positions (each player out is replaced by one of the same position) and the
+    per-club limit, and are ranked by predicted points gained minus the hit for transfers beyond the free
+    ones. Candidates are pruned by dominance per position (see `get_undominated`), and feasible pairs are
+    walked in order of gain so club limits are only checked until the top moves are found. With dominance
+    pruning, a move bringing in a dominated player is never returned, since swapping in its dominator is
+    at least as good.
+
+    Selling prices are taken as `now_cost`.
+    """
+
+    def __init__(self, ids, costs, positions, clubs, points):
+        self.ids = numpy.asarray(ids)
+        self.costs = numpy.asarray(costs, dtype=numpy.int64)
+        self.positions = numpy.asarray(positions, dtype=numpy.int64)
+        self.points = numpy.asarray(points, dtype=float)
+        club_values, self.clubs = numpy.unique(numpy.asarray(clubs), return_inverse=True)
+        self.num_clubs = len(club_values)
+        self.club_one_hot = numpy.eye(self.num_clubs, dtype=numpy.int8)[self.clubs]
+        self.rows = {player_id: row for row, player_id in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def from_frame(cls, players, points):
+        """
+        Builds a search from a player frame indexed by id with 'now_cost', 'element_type' and 'team' columns.
+
+        Args:
+            players (pandas.DataFrame): The player pool, e.g. `DataContainer.players`.
+            points (pandas.Series): Predicted points indexed by player id, e.g. from `Predictor.predict`.
+                Players without a prediction are given 0.
+        """
+        points = points.reindex(players.index).fillna(0)
+        return cls(players.index.to_numpy(), players['now_cost'].to_numpy(), players['element_type'].to_numpy(),
+                   players['team'].to_numpy(), points.to_numpy())
+
+    def get_candidates(self, squad_rows, num_transfers):
+        """
+        Returns, per position, the rows of the players outside the squad that survive dominance pruning.
+        """
+        outside = numpy.ones(len(self.ids), dtype=bool)
+        outside[squad_rows] = False
+        candidates = {}
+        for position in numpy.unique(self.positions[squad_rows]).tolist():
+            rows = numpy.flatnonzero(outside & (self.positions == position))
+            keep = get_undominated(self.costs[rows], self.points[rows], self.clubs[rows], self.num_clubs, num_transfers)
+            candidates[position] = rows[keep]
+        return candidates
+
+    def get_position_combos(self, rows, count):
+        """
+        Returns every set of `count` players from `rows`, with their summed predicted points and costs.
+        """
+        combos = numpy.array(list(combinations(rows.tolist(), count)), dtype=numpy.int64).reshape(-1, count)
+        return combos, self.points[combos].sum(axis=1), self.costs[combos].sum(axis=1)
+
+    def get_in_combos(self, position_combos, needed):
+        """
+        Returns every set of players coming in for a position signature, with their summed points and costs.
+
+        Args:
+            position_combos (dict): (position, count) to the output of `get_position_combos`.
+            needed (dict): Number of players needed per position.
+
+        Returns:
+            tuple: The (combos x transfers) row array, and the points and costs of each combo.
+        """
+        parts = [position_combos[item] for item in needed.items()]
+        if any(len(combos) == 0 for combos, _, _ in parts):
+            return numpy.empty((0, sum(needed.values())), dtype=numpy.int64), numpy.empty(0), numpy.empty(0, dtype=numpy.int64)
+        grids = [grid.ravel() for grid in numpy.meshgrid(*[numpy.arange(len(combos)) for combos, _, _ in parts], indexing='ij')]
+        rows = numpy.hstack([combos[grid] for (combos, _, _), grid in zip(parts, grids)])
+        points = sum(part_points[grid] for (_, part_points, _), grid in zip(parts, grids))
+        costs = sum(part_costs[grid] for (_, _, part_costs), grid in zip(parts, grids))
+        return rows, points, costs
+
+    def search(self, squad_ids, bank, max_transfers=2, free_transfers=1, top_n=10,
+               hit_cost=TRANSFER_HIT_COST, max_per_club=MAX_PLAYERS_PER_CLUB):
+        """
+        Finds the best moves of 1 to `max_transfers` transfers for a squad.
+
+        Args:
+            squad_ids (list): The IDs of the 15 players in the squad.
+            bank (int): Money in the bank, in 0.1m units.
+            max_transfers (int): The most transfers in one move.
+            free_transfers (int): Transfers available without a hit.
+            top_n (int): The number of moves to return.
+            hit_cost (int): Points deducted per transfer beyond the free ones.
+            max_per_club (int): Players allowed from one club.
+
+        Returns:
+            list: The best `TransferMove`s, highest net gain first.
+
+        Raises:
+            ValueError: If a squad player is not in the pool, e.g. because the pool was filtered before the search.
+        """
+        unknown = [player_id for player_id in squad_ids if player_id not in self.rows]
+        if unknown:
+            raise ValueError(f"Squad players not in the pool: {unknown}")
+        squad_rows = numpy.array([self.rows[player_id] for player_id in squad_ids], dtype=numpy.int64)
+        squad_club_counts = self.club_one_hot[squad_rows].sum(axis=0, dtype=numpy.int64)
+        found = []  # (net_gain, out rows, in rows, points_gain, hit, cost_change)
+        for num_transfers in range(1, max_transfers + 1):
+            hit = max(0, num_transfers - free_transfers) * hit_cost
+            candidates = self.get_candidates(squad_rows, num_transfers)
+            position_combos = {(position, count): self.get_position_combos(rows, count)
+                               for position, rows in candidates.items() for count in range(1, num_transfers + 1)}
+            outs = squad_rows[numpy.array(list(combinations(range(len(squad_rows)), num_transfers)), dtype=numpy.int64)]
+            signatures = numpy.sort(self.positions[outs], axis=1)
+            for signature in numpy.unique(signatures, axis=0):
+                group_outs = outs[(signatures == signature).all(axis=1)]
+                positions, counts = numpy.unique(signature, return_counts=True)
+                ins = self.get_in_combos(position_combos, dict(zip(positions.tolist(), counts.tolist())))
+                if len(ins[0]) == 0:
+                    continue
+                threshold = found[top_n - 1][0] if len(found) >= top_n else -numpy.inf
+                found.extend(self.best_pairs(group_outs, *ins, squad_club_counts, bank, hit, threshold, top_n, max_per_club))
+                found.sort(key=lambda move: -move[0])
+                del found[top_n:]
+        # In rows come grouped by ascending position, so sorting the out rows the same way pairs them up
+        return [TransferMove(tuple(self.ids[out_rows[numpy.argsort(self.positions[out_rows], kind='stable')]].tolist()),
+                             tuple(self.ids[in_rows].tolist()), float(points_gain), hit, float(net_gain), int(cost_change))
+                for net_gain, out_rows, in_rows, points_gain, hit, cost_change in found]
+
+    def best_pairs(self, outs, ins, in_points, in_costs, squad_club_counts, bank, hit, threshold, top_n, max_per_club):
+        """
+        Returns up to `top_n` valid (out, in) pairs of one position signature that beat `threshold`, best first.
+        """
+        out_points, out_costs = self.points[outs].sum(axis=1), self.costs[outs].sum(axis=1)
+        # Drop in and out sets that cannot beat the threshold or fit the bank even against the best counterpart.
+        keep_ins = (in_points - out_points.min() - hit > threshold) & (in_costs - out_costs.max() <= bank)
+        keep_outs = (in_points.max() - out_points - hit > threshold) & (in_costs.min() - out_costs <= bank)
+        ins, in_points, in_costs = ins[keep_ins], in_points[keep_ins], in_costs[keep_ins]
+        outs, out_points, out_costs = outs[keep_outs], out_points[keep_outs], out_costs[keep_outs]
+        if len(ins) == 0 or len(outs) == 0:
+            return []
+        cost_change = in_costs[None, :] - out_costs[:, None]
+        points_gain = in_points[None, :] - out_points[:, None]
+        out_idx, in_idx = numpy.nonzero((cost_change <= bank) & (points_gain - hit > threshold))
+        if len(out_idx) == 0:
+            return []
+        gains = points_gain[out_idx, in_idx]
+        order = numpy.argsort(-gains, kind='stable')
+        base_counts = squad_club_counts[None, :] - self.club_one_hot[outs].sum(axis=1, dtype=numpy.int64)
+        pairs = []
+        for start in range(0, len(order), CLUB_CHECK_BLOCK):
+            block = order[start:start + CLUB_CHECK_BLOCK]
+            in_counts = self.club_one_hot[ins[in_idx[block]]].sum(axis=1, dtype=numpy.int64)
+            valid = ((base_counts[out_idx[block]] + in_counts) <= max_per_club).all(axis=1)
+            for pair in block[valid]:
+                o, i = out_idx[pair], in_idx[pair]
+                pairs.append((points_gain[o, i] - hit, outs[o], ins[i], points_gain[o, i], hit, cost_change[o, i]))
+                if len(pairs) == top_n:
+                    return pairs
+        return pairs
@@ -1,36 +1,36 @@
-from constants import RAW_PLAYER_STATS_URL, RAW_FIXTURE_DATA_URL,INJURED_FLAGS,TEAM_ID
-from functools import lru_cache, wraps
+from constants import RAW_PLAYER_STATS_URL, RAW_FIXTURE_DATA_URL,FETCH_MAX_WORKERS,FETCH_REQUESTS_PER_SECOND,SNAPSHOT_REQUIRED_FIELDS
+from cache import ResponseCache
+from fetching import fetch_many
+from fixture_index import FixtureIndex
+from history_store import PlayerHistoryStore
+from snapshot_loader import load_elements_frame
+from snapshot_archive import ArchivedSnapshot
+from metrics import METRICS
+from functools import wraps
 from datetime import datetime,timedelta
-import requests
 import logging
 import inspect
 import pandas
 import time
-import json
 
 
-def memoize_with_logging(func):
-    cached_func = lru_cache(maxsize=None)(func)
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        key = args + tuple(sorted(kwargs.items()))
-        if key not in wrapper._cache:
-            logging.info(f"🔵 Cache miss for args:{args}, kwargs:{kwargs}")
-        else:
-            logging.info(f"🟢 Cache hit for args:{args}, kwargs:{kwargs}")
-        result = cached_func(*args, **kwargs)
-        wrapper._cache.add(key)
-        return result
-    wrapper._cache = set()
-    return wrapper
+RESPONSE_CACHE = ResponseCache()
+
+def set_offline_mode(offline=True):
+    """
+    Switches the shared response cache in or out of offline mode. While offline, every query is served from
+    the on-disk store and a URL that was never stored raises `cache.OfflineCacheMiss` instead of going to the network.
+    Offline mode can also be switched on for a whole process with the FPL_OFFLINE=1 environment variable.
+    """
+    RESPONSE_CACHE.offline = offline
 
-@memoize_with_logging
 def query_API( url ):
     """
-    Query a given URL, expecting a JSON response.
+    Query a given URL, expecting a JSON response. Responses are kept in the shared on-disk `RESPONSE_CACHE`
+    so repeated queries, including those from new processes, are served without going to the network until
+    the TTL for that kind of URL runs out.
 
     Args:
-        cls: Ignored, included for staticmethod compatibility.
         url (str): The URL to query.
 
     Returns:
@@ -39,12 +39,17 @@ def query_API( url ):
     Raises:
         Exception: If the response status code is not 200.
     """
-    logging.info(f"Querying API with URL:{url}. Should be memoized. So won't see this again.")
-    results = requests.get(url)
-    if results.status_code == 200:
-        return json.loads(results.content.decode('utf-8'))
-    else:
-        raise Exception(f"Failed to fetch data: {results.status_code}, URL: {url}")
+    return RESPONSE_CACHE.get_json(url)
+
+def poll_API( url ):
+    """
+    Query a given URL with a conditional request whatever the age of its stored response, for payloads that
+    change while they are polled.
+
+    Returns:
+        tuple: The JSON-decoded response and whether it changed since it was last stored.
+    """
+    return RESPONSE_CACHE.poll(url)
 
 
 def get_player_ids_for_entry(entry_id,event_id):
@@ -59,42 +64,52 @@ def get_player_ids_for_entry(entry_id,event_id):
         list: A list of player IDs representing the picks for the specified entry and event.
     """
 
-    url = f"https://fantasy.premierleague.com/api/entry/{entry_id}/event/{event_id}/picks/"
-    data = query_API(url)
+    data = query_API(get_picks_url(entry_id,event_id))
     return [pick['element'] for pick in data['picks']]
 
-CURRENT_TEAM_IDS = get_player_ids_for_entry(TEAM_ID,1)
+def get_picks_url(entry_id,event_id):
+    return f"https://fantasy.premierleague.com/api/entry/{entry_id}/event/{event_id}/picks/"
 
-def update_current_team_ids(gw):
-    global CURRENT_TEAM_IDS
-    CURRENT_TEAM_IDS = get_player_ids_for_entry(TEAM_ID,gw)
+def summarize_for_log(value):
+    """
+    Returns a short description of a value for DEBUG logs, so large frames and payloads are not repr'd in full.
+    """
+    if isinstance(value, (pandas.DataFrame, pandas.Series)):
+        return f"{type(value).__name__}(shape={value.shape})"
+    if isinstance(value, (dict, list, tuple, set)) and len(value) > 10:
+        return f"{type(value).__name__}(len={len(value)})"
+    if isinstance(value, tuple):
+        return tuple(summarize_for_log(item) for item in value)
+    return value
 
 def logger(decorated_method):
     """
     Decorator to log the execution and completion of a method. Including the method name, start time, and end time.
-    Also logs input and output variables under DEBUG level.
+    Also logs a summary of the input and output variables under DEBUG level, and records the method's wall and CPU
+    time in `metrics.METRICS` when it is enabled.
     """
     @wraps(decorated_method)
     def wrapper(*args, **kwargs):
         start_time = time.time()
+        cpu_start_time = time.process_time()
         logging.info(f"Starting method: {decorated_method.__name__}")
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         
         # Log input variables under DEBUG level
-        if logging.getLogger().getEffectiveLevel() == logging.DEBUG:
-            args_repr = [repr(a) for a in args]
-            kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
+        if debug:
             signature = inspect.signature(decorated_method)
             bound_args = signature.bind(*args, **kwargs)
             bound_args.apply_defaults()
-            logging.debug(f"Input variables: {bound_args.arguments}")
+            logging.debug(f"Input variables: { {name: summarize_for_log(value) for name, value in bound_args.arguments.items()} }")
         
         result = decorated_method(*args, **kwargs)
         
         # Log output variables under DEBUG level
-        if logging.getLogger().getEffectiveLevel() == logging.DEBUG:
-            logging.debug(f"Output variable: {result!r}")
+        if debug:
+            logging.debug(f"Output variable: {summarize_for_log(result)!r}")
         
         end_time = time.time()
+        METRICS.record_stage(decorated_method.__qualname__, end_time - start_time, time.process_time() - cpu_start_time)
         logging.info(f"Method {decorated_method.__name__} completed in {end_time - start_time:.2f} seconds")
         return result
     return wrapper
@@ -144,6 +159,9 @@ def get_raw_season_stats_snap():
     """
     return query_API(RAW_PLAYER_STATS_URL)
 
+def get_historic_player_stats_url( date_str ):
+    return f"https://web.archive.org/web/{date_str}/"+RAW_PLAYER_STATS_URL
+
 @logger
 def get_raw_historic_player_stats_snap( date_str ):
     """
@@ -155,7 +173,7 @@ def get_raw_historic_player_stats_snap( date_str ):
     Returns:
         dict: The JSON-decoded response.
     """
-    return query_API(f"https://web.archive.org/web/{date_str}/"+RAW_PLAYER_STATS_URL)
+    return query_API(get_historic_player_stats_url(date_str))
 
 @logger
 def get_raw_fixture_data():
@@ -189,6 +207,12 @@ def get_gameweek_to_datestr_mapping( events ):
         mapping[gw] = datestr
     return mapping
 
+def get_season_start_year( events ):
+    """
+    Returns the year the season described by `events` started in, taken from the first gameweek's deadline.
+    """
+    return int(events[0]['deadline_time'][:4])
+
 @logger
 def get_current_gameweek( events ):
     """
@@ -206,7 +230,11 @@ def get_current_gameweek( events ):
         return current_gw["id"]
     return None
 
-def process_dictdata_to_dataframe(dictdata):
+def process_dictdata_to_dataframe(dictdata,team_ids=()):
+    """
+    Builds an untyped player DataFrame from a dictionary of player dictionaries. Superseded by
+    `snapshot_loader.load_elements_frame`, which `get_player_data` uses; kept for comparison in the benchmarks.
+    """
     import pandas
     df = pandas.DataFrame.from_dict(dictdata)
     
@@ -218,7 +246,7 @@ def process_dictdata_to_dataframe(dictdata):
     df = df.T
     dropping = df[df['minutes'] == 0]
     logging.warn(f"Dropping rows with no minutes played. {len(dropping)} rows dropped")
-    logging.warn(f"Dropping IDs in Current Team: {[x for x in dropping['id'] if x in CURRENT_TEAM_IDS]}")
+    logging.warn(f"Dropping IDs in Current Team: {[x for x in dropping['id'] if x in team_ids]}")
     df = df[df["minutes"] > 0]
     return df
 
@@ -227,22 +255,39 @@ def filter_dataframe(df,filters=None):
         return df[filters]
     return df
 
-def get_player_data(snap=None,gw=None):
+def drop_players_without_minutes(df,team_ids=()):
+    dropping = df[df['minutes'] == 0]
+    logging.warning(f"Dropping rows with no minutes played. {len(dropping)} rows dropped")
+    logging.warning(f"Dropping IDs in Current Team: {[x for x in dropping.index if x in team_ids]}")
+    return df[df["minutes"] > 0]
+
+def get_player_data(snap=None,gw=None,fields=None,team_context=None):
     """
     Retrieves player data from the FPL API, optionally using a cache for the raw player data.
     
     If cache is provided, the function will use the cache to store the raw player data.
+
+    Args:
+        snap (dict or ArchivedSnapshot): A bootstrap-static snapshot to use instead of the current one, raw or archived.
+        gw (int): The gameweek the snapshot is for, used to look up the current team in `team_context`.
+        fields (list): The element fields to load, on top of `SNAPSHOT_REQUIRED_FIELDS`. Defaults to every field.
+        team_context (TeamContext): Picks used to report which of the current team's players are dropped.
     
     Returns:
         tuple: A tuple of three elements, the first being a DataFrame of player data, the second being a dictionary mapping player IDs to their positions, and the third being the raw season stats snapshot used to generate the player data.
     """
     if snap is None: 
         snap = get_raw_season_stats_snap()
-    if gw:
-        update_current_team_ids(gw)
-    players_dict,id_to_pos_map = extract_player_dict_from_snap(snap,)
-    players_snap = process_dictdata_to_dataframe(players_dict)
-    players_snap.set_index('id',inplace=True)
+    team_ids = team_context.player_ids(gw) if team_context is not None and gw else ()
+    if fields is not None:
+        fields = SNAPSHOT_REQUIRED_FIELDS + list(fields)
+    if isinstance(snap, ArchivedSnapshot):
+        elements = snap.elements_frame(fields)
+        id_to_pos_map = dict(zip(elements['web_name'].astype(object), elements.index.tolist()))
+    else:
+        _,id_to_pos_map = extract_player_dict_from_snap(snap,)
+        elements = load_elements_frame(snap['elements'], fields)
+    players_snap = drop_players_without_minutes(elements,team_ids)
     return players_snap,id_to_pos_map,snap
 
 def get_dynamic_horizon(gw, total_gws, max_horizon=5, min_horizon=1):
@@ -251,33 +296,43 @@ def get_dynamic_horizon(gw, total_gws, max_horizon=5, min_horizon=1):
     dynamic_horizon = max(min_horizon, int(round(max_horizon * (1 - season_progress))))
     return dynamic_horizon
 
-def get_team_fixture_info(fixtures, start_gw, end_gw):
-        """
-        Returns a dict of team_id → dict with 'num_fixtures' and 'total_fdr'
-        """
-
-        team_fixture_data = {}
+_FIXTURE_INDEX_CACHE = (None, None)
 
-        for fixture in fixtures:
-            gw = fixture.get("event")
-            if gw is None or not (start_gw <= gw <= end_gw):
-                continue
+def get_fixture_index(raw_fixture_data=None):
+    """
+    Returns the `FixtureIndex` for the given fixture data, or for `get_raw_fixture_data()` if none is given.
+    The index is rebuilt only when the fixture payload itself changes.
+    """
+    global _FIXTURE_INDEX_CACHE
+    if raw_fixture_data is None:
+        raw_fixture_data = get_raw_fixture_data()
+    cached_fixtures, cached_index = _FIXTURE_INDEX_CACHE
+    if cached_fixtures is not raw_fixture_data:
+        cached_index = FixtureIndex(raw_fixture_data)
+        _FIXTURE_INDEX_CACHE = (raw_fixture_data, cached_index)
+    return cached_index
 
-            # Home team
-            home_id = fixture["team_h"]
-            home_difficulty = fixture["team_h_difficulty"]
-            team_fixture_data.setdefault(home_id, {"num_fixtures": 0, "total_fdr": 0})
-            team_fixture_data[home_id]["num_fixtures"] += 1
-            team_fixture_data[home_id]["total_fdr"] += home_difficulty
+@logger
+def get_player_history_store(player_ids, history_store=None):
+    """
+    Returns a `PlayerHistoryStore` covering the given players, loading their element-summary payloads concurrently.
 
-            # Away team
-            away_id = fixture["team_a"]
-            away_difficulty = fixture["team_a_difficulty"]
-            team_fixture_data.setdefault(away_id, {"num_fixtures": 0, "total_fdr": 0})
-            team_fixture_data[away_id]["num_fixtures"] += 1
-            team_fixture_data[away_id]["total_fdr"] += away_difficulty
+    Args:
+        player_ids (iterable): The IDs of the players the store must cover.
+        history_store (PlayerHistoryStore): An existing store, returned as is if it already covers every player,
+            otherwise its players are included in the new store.
 
-        return team_fixture_data
+    Returns:
+        PlayerHistoryStore: A store covering every player whose element-summary could be loaded.
+    """
+    player_ids = set(int(player_id) for player_id in player_ids)
+    if history_store is not None:
+        if history_store.covers(list(player_ids)):
+            return history_store
+        player_ids.update(int(player_id) for player_id in history_store.player_ids)
+    failed = prefetch_player_gameweek_data(player_ids)
+    summaries = {player_id: query_API(get_element_summary_url(player_id)) for player_id in player_ids if player_id not in failed}
+    return PlayerHistoryStore(summaries)
 
 # def get_current_predictor_data(curr_gw=None):
 #     players_df,_,stats = get_player_data()
@@ -294,114 +349,37 @@ def get_team_fixture_info(fixtures, start_gw, end_gw):
 #     players_df.loc[:,'horizon'] = 1
 #     return players_df
 
-def get_player_gameweek_data(row,index):
-    """
-    Retrieves, from the data_container, gameweek data for a specific player within a specified range of gameweeks.
+def get_element_summary_url(player_id):
+    return f"https://fantasy.premierleague.com/api/element-summary/{player_id}/"
 
-    Args:
-        player_id (int): The ID of the player to retrieve gameweek data for.
-        start_gw (int): The starting gameweek number.
-        end_gw (int): The ending gameweek number.
+def prefetch(urls, max_workers=FETCH_MAX_WORKERS, requests_per_second=FETCH_REQUESTS_PER_SECOND):
+    """
+    Fetches many URLs concurrently into the response cache, skipping those already stored and fresh so that
+    only real requests go through the rate limiter.
 
     Returns:
-        list: A list of dictionaries containing the gameweek data for the specified player and range.
+        dict: A dictionary mapping URLs to the exception raised for those that could not be fetched.
     """
-    id_num = index
-    logging.info(f"Querying API, for: {row['web_name']}")
-    url = f"https://fantasy.premierleague.com/api/element-summary/{id_num}/"
-    data = query_API(url)
-    filtered = [gw for gw in data["history"] if row["gw"]+1 <= gw["round"] <= row["last_gw"]]
-    if not filtered:
-        filtered = [gw for gw in data["fixtures"] if row["gw"]+1 <= gw["event"] <= row["last_gw"]]
-    return filtered    
+    stale = [url for url in urls if not RESPONSE_CACHE.has_fresh(url)]
+    _, errors = fetch_many(stale, query_API, max_workers=max_workers, requests_per_second=requests_per_second)
+    return errors
 
-def get_future_points_and_fdr(row,gw_data,raw_fixture_data,):
+@logger
+def prefetch_player_gameweek_data(player_ids, max_workers=FETCH_MAX_WORKERS, requests_per_second=FETCH_REQUESTS_PER_SECOND):
     """
-    Get future points and fixture difficulty for a player.
+    Fetches the element-summary payloads for many players concurrently so the per-player lookups that follow
+    are served from the response cache instead of making one blocking request each.
 
     Args:
-        row: pandas Series, a player row from the players dataframe
-        start_gw: int, the start gameweek
-        end_gw: int, the end gameweek
+        player_ids (iterable): The IDs of the players to fetch.
+        max_workers (int): Maximum number of requests in flight at once.
+        requests_per_second (float): Polite upper bound on request starts per second.
 
     Returns:
-        tuple of (future_points, num_fixtures, total_fdr, total_minutes)
-            future_points: int, total points scored by the player in the given gameweek range
-            num_fixtures: int, number of fixtures the player's team has in the given gameweek range
-            total_fdr: int, total fixture difficulty for the player's team in the given gameweek range
-            total_minutes: int, total minutes played by the player in the given gameweek range
-    """
-    try:
-        # Get team-level fixture info
-        logging.info(f"Getting team fixture info between gw {row['gw']+1} and gw {row['last_gw']}")
-        team_fixture_info = get_team_fixture_info(raw_fixture_data,row["gw"]+1,row["last_gw"])
-        team_id = int(row["team"])
-        logging.info(f"Filtering for team id: {team_id}")
-        fixture_data = team_fixture_info.get(team_id, {"num_fixtures": 0, "total_fdr": 0})
-
-        future_points = sum(gw["total_points"] if gw.get("total_points")  else 0 for gw in gw_data )
-        total_minutes = sum(gw["minutes"]  if gw.get("minutes") else 0 for gw in gw_data)
-
-        return future_points, fixture_data["num_fixtures"], fixture_data["total_fdr"], total_minutes
-    except Exception as e:
-        print(f"Error with player {row.name}: {e}")
-        return None, None, None, None
-
-def add_extra_features(snapshot,snapshot_dict,features):
-    if any(strength in features for strength in ["strength_overall_home","strength_overall_away","strength_attack_home","strength_attack_away","strength_defence_home","strength_defence_away",]):
-        # Add team strength fields from snapshot_dict["teams"]
-        strengths = [strength for strength in ["strength_overall_home","strength_overall_away","strength_attack_home","strength_attack_away","strength_defence_home","strength_defence_away",] if strength in features]
-        team_strength_df = pandas.DataFrame(snapshot_dict["teams"])
-        team_strength_df = team_strength_df[['id',]+strengths]
-        
-        # Rename team id to match player field
-        team_strength_df.rename(columns={"id": "team"}, inplace=True)
-
-        # Merge team strength info into the snapshot on team ID
-        snapshot = snapshot.merge(team_strength_df, on="team", how="left")
-        
-    if "is_injured" in features:
-        snapshot["is_injured"] = snapshot["status"].apply(lambda x: 1 if x in INJURED_FLAGS else 0)
-        
-    future_points_list = []
-    num_fixtures_list = []
-    fdr_list = []
-    minutes_list = []
-    points_per_90 = []
-    adjusted_points_per_90 = []
-    raw_fixture_data = get_raw_fixture_data()
-    index_list = []
-    for index, row in snapshot.iterrows():
-        gw_data = get_player_gameweek_data(row,index)
-        pts, nfix, tfdr, mins = get_future_points_and_fdr(row, gw_data,raw_fixture_data,)
-        if mins is None:
-            continue
-        future_points_list.append(pts)
-        num_fixtures_list.append(nfix)
-        fdr_list.append(tfdr)
-        minutes_list.append(mins)
-        p90 = (pts / mins) * 90 if mins else 1# Avoid div by zero
-        #normalize with a simple linear adjustment
-        fdr_adjustment = 1 / (1 + tfdr) if tfdr else 1  # Avoid div by zero
-        adjusted_p90 = p90 * fdr_adjustment
-        points_per_90.append(p90)
-        adjusted_points_per_90.append(adjusted_p90)
-        index_list.append(index)
-    included_features = [feat for feat in ["num_fixtures", "total_fdr", "minutes_played_horizon","points_per_90","adjusted_points_per_90"] if feat in features] + ["future_points"]
-    # Create a new DataFrame with the new columns (no need to set index manually)
-    horizon = len(set([game.get('round',game.get('event')) for game in gw_data]))
-    horizons_list = [horizon] * len(future_points_list)
-    new_columns_df = pandas.DataFrame({
-        "future_points": future_points_list,
-        "num_fixtures": num_fixtures_list,
-        "total_fdr": fdr_list,
-        "minutes": minutes_list,
-        "points_per_90": points_per_90,
-        "adjusted_points_per_90": adjusted_points_per_90,
-        "horizon": horizons_list,
-        "id": index_list
-    })
-    new_columns_df.set_index("id", inplace=True)
-    # Concatenate the new columns with the original DataFrame (index will align automatically)
-    snapshot.update(new_columns_df[included_features])# = pandas.concat([snapshot, new_columns_df[included_features]], axis=1)
-    return snapshot
+        dict: A dictionary mapping player IDs to the exception raised for players that could not be fetched.
+    """
+    urls = {get_element_summary_url(player_id): player_id for player_id in player_ids}
+    errors = prefetch(urls, max_workers=max_workers, requests_per_second=requests_per_second)
+    for url, error in errors.items():
+        logging.warning(f"Failed to prefetch player {urls[url]}: {error}")
+    return {urls[url]: error for url, error in errors.items()}
@@ -0,0 +1,187 @@
+from constants import (
+    WAYBACK_MAX_WORKERS,
+    WAYBACK_REQUESTS_PER_SECOND,
+    WAYBACK_FALLBACK_OFFSETS_HOURS,
+    WAYBACK_CDX_URL,
+    WAYBACK_MAX_CAPTURE_CANDIDATES,
+    RAW_PLAYER_STATS_URL,
+    FETCH_RETRIES,
+    FETCH_BACKOFF,
+)
+from utils import query_API, get_historic_player_stats_url, logger
+from fetching import RateLimiter, fetch_with_retry
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+import bisect
+import logging
+
+DATESTR_FORMAT = "%Y%m%d%H%M%S"
+
+
+@dataclass
+class SnapshotStatus():
+    """
+    Outcome of loading one gameweek's archived bootstrap-static snapshot.
+
+    `status` is 'ok' when the requested capture loaded, 'fallback' when a neighbouring timestamp had to be used,
+    'failed' when every candidate failed and 'archived' when it was read from a `SnapshotArchive` instead. `date_str` is the timestamp that actually loaded, if any.
+    """
+    gw: int
+    status: str
+    requested_date_str: str = None
+    date_str: str = None
+    attempts: list = field(default_factory=list)
+    error: str = None
+
+
+def get_capture_index_url(season, url=RAW_PLAYER_STATS_URL):
+    """
+    Returns the CDX query listing every successful capture of `url` from July of the season's start year to
+    July of the next.
+    """
+    params = {'url': url, 'from': f"{season}07", 'to': f"{season + 1}07", 'output': 'json', 'fl': 'timestamp',
+              'filter': 'statuscode:200'}
+    return f"{WAYBACK_CDX_URL}?{urlencode(params)}"
+
+
+class CaptureIndex():
+    """
+    The archive's capture timestamps of bootstrap-static over one season, from a single CDX query that the
+    response cache keeps on disk.
+
+    Each gameweek resolves to the latest capture before its deadline and after the previous gameweek's, and that
+    exact timestamp is requested. The archive then serves the capture itself instead of redirecting to whichever
+    capture is nearest a guessed time, which could come after the deadline. The same captures are picked on every
+    build.
+    """
+
+    def __init__(self, timestamps):
+        self.timestamps = sorted(set(timestamps))
+
+    @classmethod
+    def fetch(cls, season, url=RAW_PLAYER_STATS_URL, retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+        """
+        Args:
+            season (int): The year the season started in.
+            url (str): The archived URL to list captures of.
+
+        Returns:
+            CaptureIndex: The season's captures.
+        """
+        rows = fetch_with_retry(query_API, get_capture_index_url(season, url), None, retries, backoff)
+        index = cls(row[0] for row in rows[1:])  # The first row is the field names
+        logging.info(f"Capture index for season {season} lists {len(index.timestamps)} captures")
+        return index
+
+    def get_captures_between(self, after, before, limit=None):
+        """
+        Returns the capture timestamps strictly between two 'YYYYMMDDhhmmss' timestamps, latest first.
+        """
+        low = bisect.bisect_right(self.timestamps, after) if after is not None else 0
+        high = bisect.bisect_left(self.timestamps, before)
+        captures = self.timestamps[low:high][::-1]
+        return captures if limit is None else captures[:limit]
+
+    def get_gameweek_candidates(self, events, limit=WAYBACK_MAX_CAPTURE_CANDIDATES):
+        """
+        Maps each gameweek to the captures taken since the previous gameweek's deadline and before its own,
+        latest first. Gameweeks without such a capture are left out.
+
+        Args:
+            events (list): The list of events from the raw season stats snapshot.
+            limit (int): Most captures kept per gameweek.
+
+        Returns:
+            dict: Gameweek IDs mapped to lists of 'YYYYMMDDhhmmss' capture timestamps.
+        """
+        candidates, previous = {}, None
+        for event in sorted(events, key=lambda event: event['id']):
+            deadline = datetime.strptime(event['deadline_time'], "%Y-%m-%dT%H:%M:%SZ").strftime(DATESTR_FORMAT)
+            captures = self.get_captures_between(previous, deadline, limit)
+            if captures:
+                candidates[event['id']] = captures
+            previous = deadline
+        missing = [event['id'] for event in events if event['id'] not in candidates]
+        if missing:
+            logging.info(f"No capture since the previous deadline for gameweeks {missing}")
+        return candidates
+
+
+def get_candidate_datestrs(date_str, offsets_hours=WAYBACK_FALLBACK_OFFSETS_HOURS):
+    """
+    Returns the requested timestamp followed by its neighbouring fallback timestamps, in the order they should be tried.
+    """
+    dt = datetime.strptime(date_str, DATESTR_FORMAT)
+    return [date_str] + [(dt + timedelta(hours=offset)).strftime(DATESTR_FORMAT) for offset in offsets_hours]
+
+
+def load_snapshot(gw, date_str, rate_limiter=None, retries=FETCH_RETRIES, backoff=FETCH_BACKOFF, offsets_hours=WAYBACK_FALLBACK_OFFSETS_HOURS, candidates=None):
+    """
+    Loads one gameweek's archived snapshot, falling back to neighbouring capture timestamps when the requested one fails.
+    `candidates`, e.g. from a `CaptureIndex`, replaces the timestamps derived from `offsets_hours`.
+
+    Returns:
+        tuple: The JSON-decoded snapshot (None if every candidate failed) and its `SnapshotStatus`.
+    """
+    report = SnapshotStatus(gw=gw, status='failed', requested_date_str=date_str)
+    if date_str is None:
+        report.error = f"No capture timestamp known for gameweek {gw}"
+        return None, report
+    for candidate in candidates or get_candidate_datestrs(date_str, offsets_hours):
+        report.attempts.append(candidate)
+        try:
+            snap = fetch_with_retry(query_API, get_historic_player_stats_url(candidate), rate_limiter, retries, backoff)
+        except Exception as e:
+            report.error = str(e)
+            logging.warning(f"Failed to fetch snapshot for gameweek {gw} at {candidate}: {e}")
+            continue
+        report.status = 'ok' if candidate == date_str else 'fallback'
+        report.date_str = candidate
+        report.error = None
+        return snap, report
+    return None, report
+
+
+@logger
+def load_snapshot_range(gameweek_to_datestr_mapping, start_gw, end_gw, max_workers=WAYBACK_MAX_WORKERS,
+                        requests_per_second=WAYBACK_REQUESTS_PER_SECOND, retries=FETCH_RETRIES, backoff=FETCH_BACKOFF, skip_gws=(),
+                        candidates=None):
+    """
+    Fetches the archived bootstrap-static snapshots for gameweeks [start_gw, end_gw) concurrently.
+
+    Args:
+        gameweek_to_datestr_mapping (dict): Gameweek IDs mapped to the 'YYYYMMDDhhmmss' capture timestamp to request.
+        start_gw (int): The first gameweek to load.
+        end_gw (int): The gameweek to stop before.
+        max_workers (int): Maximum number of snapshots downloading at once.
+        requests_per_second (float): Polite upper bound on request starts per second against the archive.
+        retries (int): Number of retries per capture timestamp after the first attempt.
+        backoff (float): Delay in seconds before the first retry, doubled for each one after.
+        skip_gws (iterable): Gameweeks in the range not to fetch, e.g. because they are already archived.
+        candidates (dict): Gameweek IDs mapped to the capture timestamps to try in order, e.g. from
+            `CaptureIndex.get_gameweek_candidates`. Gameweeks in it skip the guessed fallback timestamps.
+
+    Returns:
+        tuple: A dictionary mapping gameweeks to snapshots, containing only the gameweeks that loaded, and a
+        dictionary mapping every requested gameweek to its `SnapshotStatus`.
+    """
+    rate_limiter = RateLimiter(requests_per_second)
+    gws = [gw for gw in range(start_gw, end_gw) if gw not in set(skip_gws)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        loaded = list(executor.map(
+            lambda gw: load_snapshot(gw, gameweek_to_datestr_mapping.get(gw), rate_limiter, retries, backoff,
+                                     candidates=(candidates or {}).get(gw)), gws))
+
+    snapshots, report = {}, {}
+    for gw, (snap, status) in zip(gws, loaded):
+        report[gw] = status
+        if snap is not None:
+            snapshots[gw] = snap
+    counts = {state: sum(status.status == state for status in report.values()) for state in ('ok', 'fallback', 'failed')}
+    logging.info(f"Loaded snapshots for gameweeks {start_gw}-{end_gw - 1}: {counts}")
+    failed = [gw for gw, status in report.items() if status.status == 'failed']
+    if failed:
+        logging.warning(f"No snapshot could be loaded for gameweeks {failed}; they will be skipped")
+    return snapshots, report